@@ -0,0 +1,91 @@
+"""
+Compares bootstrap replicates of a mean from repeated `lazy_sample` calls (one
+sample with replacement per replicate, of the rows or of their index joined
+back to the rows) against Poisson weights from `bootstrap`, aggregated in one
+scan in the wide and the long layout.
+
+    python benchmarks/bench_bootstrap.py --rows 1000000 --replicates 100
+"""
+
+import argparse
+import tempfile
+from functools import partial
+from pathlib import Path
+
+import polars as pl
+import polars.selectors as cs
+from common import timeit
+
+from nanook.frame import bootstrap, lazy_sample
+
+
+# Replicates are collected one by one: `pl.collect_all` would merge samples
+# that differ only in their seed as a common subplan.
+def resampled_means(lf: pl.LazyFrame, replicates: int) -> pl.DataFrame:
+    samples = [
+        lazy_sample(lf, fraction=1.0, with_replacement=True, seed=seed)
+        .select(pl.col("x").mean())
+        .collect()
+        for seed in range(replicates)
+    ]
+    return pl.concat(samples)
+
+
+def joined_means(lf: pl.LazyFrame, replicates: int) -> pl.DataFrame:
+    indexed = lf.with_row_index("index")
+    samples = [
+        lazy_sample(
+            indexed.select("index"), fraction=1.0, with_replacement=True, seed=seed
+        )
+        .join(indexed, on="index")
+        .select(pl.col("x").mean())
+        .collect()
+        for seed in range(replicates)
+    ]
+    return pl.concat(samples)
+
+
+def wide_means(lf: pl.LazyFrame, replicates: int) -> pl.DataFrame:
+    weights = cs.starts_with("weight_")
+    weighted = bootstrap(lf.select("x"), replicates)
+    return weighted.select((weights * pl.col("x")).sum() / weights.sum()).collect()
+
+
+def long_means(lf: pl.LazyFrame, replicates: int) -> pl.DataFrame:
+    weighted = bootstrap(lf.select("x"), replicates, layout="long")
+    return (
+        weighted.group_by("replicate")
+        .agg((pl.col("weight") * pl.col("x")).sum() / pl.col("weight").sum())
+        .collect(engine="streaming")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--replicates", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "data.parquet"
+        pl.select(
+            pl.int_range(args.rows).hash(0).truediv(2.0**64).alias("x")
+        ).write_parquet(path)
+        lf = pl.scan_parquet(path)
+        for replicates in args.replicates:
+            for name, function in [
+                ("lazy_sample", resampled_means),
+                ("lazy_sample join", joined_means),
+                ("bootstrap wide", wide_means),
+                ("bootstrap long", long_means),
+            ]:
+                seconds = timeit(partial(function, lf, replicates), args.repeats)
+                print(
+                    f"rows={args.rows} replicates={replicates:>5} {name:>15}: "
+                    f"{seconds:8.3f}s",
+                    flush=True,
+                )
+
+
+if __name__ == "__main__":
+    main()
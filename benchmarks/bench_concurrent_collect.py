@@ -0,0 +1,86 @@
+"""
+Compares collecting independent parquet scans one after another with
+`collect_concurrent` (thread pool) and `collect_concurrent_async`, and joining
+them with `join_dataframes` against `join_dataframes_concurrent`. Slow storage
+is simulated by a fixed latency per scan.
+
+    python benchmarks/bench_concurrent_collect.py --sources 8 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+from common import timeit
+
+from nanook.frame import (
+    collect_concurrent,
+    collect_concurrent_async,
+    join_dataframes,
+    join_dataframes_concurrent,
+)
+
+
+def write_sources(directory: Path, sources: int, rows: int) -> list[Path]:
+    paths = []
+    for index in range(sources):
+        path = directory / f"source{index}.parquet"
+        pl.select(
+            pl.int_range(rows).alias("id"),
+            pl.int_range(rows).hash(index).alias(f"x{index}"),
+        ).write_parquet(path)
+        paths.append(path)
+    return paths
+
+
+def scans(paths: list[Path], latency: float) -> list[pl.LazyFrame]:
+    def wait(df: pl.DataFrame) -> pl.DataFrame:
+        time.sleep(latency)
+        return df
+
+    return [pl.scan_parquet(path).map_batches(wait) for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sources", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--max-concurrency", type=int, nargs="+", default=[2, 8])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    print(f"sources={args.sources} rows={args.rows} latency={args.latency}s")
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_sources(Path(directory), args.sources, args.rows)
+        cases = {
+            "sequential collect": lambda: [
+                scan.collect() for scan in scans(paths, args.latency)
+            ],
+            "join_dataframes (lazy)": lambda: join_dataframes(
+                scans(paths, args.latency), on="id", how="inner"
+            ).collect(),
+        }
+        for limit in args.max_concurrency:
+            cases |= {
+                f"collect_concurrent[{limit}]": lambda limit=limit: collect_concurrent(
+                    scans(paths, args.latency), limit
+                ),
+                f"collect_concurrent_async[{limit}]": lambda limit=limit: asyncio.run(
+                    collect_concurrent_async(scans(paths, args.latency), limit)
+                ),
+                f"join_dataframes_concurrent[{limit}]": lambda limit=limit: (
+                    join_dataframes_concurrent(
+                        scans(paths, args.latency), "id", "inner", limit
+                    )
+                ),
+            }
+        for name, case in cases.items():
+            seconds = timeit(case, args.repeats)
+            print(f"{name:>36}: {seconds:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compares left joins of many feature tables keyed by a unique id: the
+left-deep chain that `join_dataframes` runs for `how="left"` against a
+balanced full-join tree of the right-hand tables joined once onto the first.
+Reports median wall time and peak RSS, each case measured in its own process.
+
+    python benchmarks/bench_join.py --rows 1000000 --tables 5 20
+"""
+
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+import polars as pl
+from common import run_isolated, timeit
+
+from nanook.frame import join_balanced, join_dataframes
+from nanook.profiling import peak_rss_mb
+
+CASES = ("left-deep", "balanced tree")
+SOURCES = ("eager", "lazy")
+
+
+def balanced_left_join(frames: list) -> pl.DataFrame | pl.LazyFrame:
+    right = join_balanced(frames[1:], ["id"], "full", presorted=False)
+    return frames[0].join(
+        right, on="id", how="left", coalesce=True, maintain_order="left"
+    )
+
+
+def run_case(args: argparse.Namespace):
+    paths = sorted(Path(args.path).glob("*.parquet"))
+    if args.source == "eager":
+        frames = [pl.read_parquet(path) for path in paths]
+    else:
+        frames = [pl.scan_parquet(path) for path in paths]
+
+    def function():
+        if args.case == "left-deep":
+            joined = join_dataframes(frames, on="id", how="left")
+        else:
+            joined = balanced_left_join(frames)
+        return joined.lazy().collect()
+
+    seconds = timeit(function, args.repeats)
+    print(json.dumps({"seconds": seconds, "peak_rss_mb": peak_rss_mb()}))
+
+
+def write_tables(directory: Path, rows: int, tables: int):
+    for table in range(tables):
+        ids = pl.int_range(rows, eager=True).shuffle(seed=table)
+        pl.DataFrame({"id": ids, f"x{table}": ids.cast(pl.Float64)}).write_parquet(
+            directory / f"table_{table:03}.parquet"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--tables", nargs="+", type=int, default=[5, 20])
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=SOURCES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case is not None:
+        run_case(args)
+        return
+    print(f"rows={args.rows}")
+    for tables in args.tables:
+        with tempfile.TemporaryDirectory() as directory:
+            write_tables(Path(directory), args.rows, tables)
+            for source in args.sources:
+                for case in CASES:
+                    result = run_isolated(
+                        __file__,
+                        *("--case", case, "--source", source, "--path", directory),
+                        *("--repeats", str(args.repeats)),
+                    )
+                    print(
+                        f"tables={tables:>3} {source:>5} {case:>13}: "
+                        f"{result['seconds']:8.3f}s "
+                        f"{result['peak_rss_mb']:10.1f} MiB peak RSS",
+                        flush=True,
+                    )
+
+
+if __name__ == "__main__":
+    main()
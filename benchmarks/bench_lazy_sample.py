@@ -0,0 +1,85 @@
+"""
+Compares the sampling methods of `frame.lazy_sample` with the previous
+index-and-join implementation on a parquet scan: median wall time and peak RSS,
+each case measured in its own process.
+
+    python benchmarks/bench_lazy_sample.py --rows 10000000 --columns 10
+"""
+
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+from common import run_isolated, timeit
+
+from nanook.frame import lazy_sample
+from nanook.profiling import peak_rss_mb
+
+
+def index_join_sample(lf: pl.LazyFrame, **sample_kwargs) -> pl.LazyFrame:
+    index = "__idx"
+    lf = lf.with_columns(pl.int_range(pl.len()).alias(index))
+    sample_idx = lf.select(pl.col(index).sample(**sample_kwargs))
+    return lf.join(sample_idx, on=index).drop(index)
+
+
+def cases(n: int, fraction: float) -> dict:
+    return {
+        "index_join_n": lambda lf: index_join_sample(lf, n=n, seed=0),
+        "exact_n": lambda lf: lazy_sample(lf, n=n, seed=0),
+        "reservoir_n": lambda lf: lazy_sample(lf, n=n, seed=0, method="reservoir"),
+        "index_join_fraction": lambda lf: index_join_sample(
+            lf, fraction=fraction, seed=0
+        ),
+        "exact_fraction": lambda lf: lazy_sample(lf, fraction=fraction, seed=0),
+        "bernoulli_fraction": lambda lf: lazy_sample(
+            lf, fraction=fraction, seed=0, method="bernoulli"
+        ),
+    }
+
+
+def write_data(path: Path, rows: int, columns: int):
+    rng = np.random.default_rng(0)
+    data = {f"x{i}": rng.normal(size=rows) for i in range(columns)}
+    pl.DataFrame(data).write_parquet(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--n", type=int, default=10_000)
+    parser.add_argument("--fraction", type=float, default=0.01)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--engine", default="streaming")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case is not None:
+        lf = pl.scan_parquet(args.path)
+        sample = cases(args.n, args.fraction)[args.case]
+        seconds = timeit(lambda: sample(lf).collect(engine=args.engine), args.repeats)
+        print(json.dumps({"seconds": seconds, "peak_rss_mb": peak_rss_mb()}))
+        return
+    print(f"rows={args.rows} columns={args.columns} engine={args.engine}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "data.parquet"
+        write_data(path, args.rows, args.columns)
+        for case in cases(args.n, args.fraction):
+            result = run_isolated(
+                __file__,
+                *("--case", case, "--path", str(path)),
+                *("--n", str(args.n), "--fraction", str(args.fraction)),
+                *("--repeats", str(args.repeats), "--engine", args.engine),
+            )
+            print(
+                f"{case:>20}: {result['seconds']:8.3f}s "
+                f"{result['peak_rss_mb']:10.1f} MiB peak RSS"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compares the planned `transform.pipeline` with the previous sequential loop.
+
+    python benchmarks/bench_pipeline.py --rows 1000000 --columns 100 --groups 100
+"""
+
+import argparse
+
+import numpy as np
+import polars as pl
+from common import timeit
+
+from nanook import transform
+
+
+def make_frame(rows: int, columns: int, groups: int, seed: int = 0) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {f"x{i}": rng.normal(size=rows) for i in range(columns)}
+    frame = pl.DataFrame(data).with_columns(
+        pl.Series("time", rng.integers(0, groups, size=rows)),
+        pl.Series("split", rng.choice(["train", "test"], size=rows, p=[0.8, 0.2])),
+    )
+    # Knock out ~10% of the values so imputation has work to do.
+    mask = pl.int_range(pl.len()).hash(seed).mod(10).eq(0)
+    return frame.with_columns(
+        pl.when(mask).then(None).otherwise(pl.col(f"x{i}")).alias(f"x{i}")
+        for i in range(columns)
+    )
+
+
+def sequential_pipeline(
+    frame: pl.LazyFrame, transforms: list[pl.Expr], over: str
+) -> pl.LazyFrame:
+    for expr in transforms:
+        frame = frame.with_columns(expr.over(over))
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--columns", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    lf = make_frame(args.rows, args.columns, args.groups).lazy()
+    names = [f"x{i}" for i in range(args.columns)]
+    is_train = pl.col("split").eq("train")
+    # One transform per column, as pipelines are usually written.
+    transforms = [
+        transform.impute(
+            pl.col(name), method="mean", train=pl.col(name).filter(is_train)
+        )
+        for name in names
+    ] + [
+        transform.standardize(
+            pl.col(name), method="zscore", train=pl.col(name).filter(is_train)
+        )
+        for name in names
+    ]
+    steps = [
+        transform.Step("impute", "mean", names),
+        transform.Step("standardize", "zscore", names),
+    ]
+    cases = {
+        "sequential": lambda: sequential_pipeline(lf, transforms, "time").collect(),
+        "planned": lambda: transform.pipeline(lf, transforms, over="time").collect(),
+        "steps": lambda: transform.pipeline(
+            lf, list(steps), over="time", train=is_train
+        ).collect(),
+    }
+    print(f"rows={args.rows} columns={args.columns} groups={args.groups}")
+    baseline = None
+    for name, case in cases.items():
+        seconds = timeit(case, args.repeats)
+        baseline = baseline or seconds
+        print(f"{name:>12}: {seconds:8.3f}s ({baseline / seconds:5.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
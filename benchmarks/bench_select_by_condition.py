@@ -0,0 +1,93 @@
+"""
+Compares the single-aggregation and column-batched modes of
+`preprocess.select_by_condition` (through `drop_null_columns`) as the number of
+columns grows: median wall time, time per column and peak RSS, each case
+measured in its own process on synthetic parquet data (see `data.py`).
+
+    python benchmarks/bench_select_by_condition.py --rows 10000 \\
+        --columns 1000 10000 50000 --batch-size 1024
+"""
+
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+import polars as pl
+from common import run_isolated, timeit
+from data import write_synthetic
+
+from nanook import preprocess
+from nanook.profiling import peak_rss_mb
+
+SOURCES = ("eager", "lazy")
+
+
+def cases(batch_size: int) -> dict:
+    return {
+        "single": {},
+        "batched": {"batch_size": batch_size},
+        "batched_parallel4": {"batch_size": batch_size, "parallel": 4},
+    }
+
+
+def run_case(args: argparse.Namespace):
+    source = f"{args.path}/*.parquet"
+    kwargs = cases(args.batch_size)[args.case]
+    if args.source == "eager":
+        data = pl.read_parquet(source)
+
+        def function():
+            return preprocess.drop_null_columns(data, cutoff=0.25, **kwargs)
+    else:
+
+        def function():
+            lf = pl.scan_parquet(source)
+            # The selected schema is resolved, which runs the condition.
+            return preprocess.drop_null_columns(lf, cutoff=0.25, **kwargs).columns
+
+    seconds = timeit(function, args.repeats)
+    print(json.dumps({"seconds": seconds, "peak_rss_mb": peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument(
+        "--columns", nargs="+", type=int, default=[1_000, 5_000, 20_000, 50_000]
+    )
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=SOURCES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case is not None:
+        run_case(args)
+        return
+    print(f"rows={args.rows} batch_size={args.batch_size}")
+    for columns in args.columns:
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic(Path(directory), args.rows, columns)
+            for source in args.sources:
+                for case in cases(args.batch_size):
+                    result = run_isolated(
+                        __file__,
+                        *("--case", case, "--source", source, "--path", directory),
+                        *("--batch-size", str(args.batch_size)),
+                        *("--repeats", str(args.repeats)),
+                    )
+                    print(
+                        f"columns={columns:>6} {source:>5} {case:>17}: "
+                        f"{result['seconds']:8.3f}s "
+                        f"{result['seconds'] / columns * 1e6:8.1f} us/column "
+                        f"{result['peak_rss_mb']:10.1f} MiB peak RSS",
+                        flush=True,
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compares per-request latency of the compiled serving path with building a
+Polars plan per request (`pipeline` and `Transformer.transform`).
+
+    python benchmarks/bench_serving.py --columns 20 --groups 100
+"""
+
+import argparse
+
+import numpy as np
+import polars as pl
+from common import timeit
+
+from nanook import transform
+from nanook.serving import CompiledTransformer
+
+
+def make_frame(rows: int, columns: int, groups: int, seed: int = 0) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {f"x{i}": rng.normal(size=rows) for i in range(columns)}
+    frame = pl.DataFrame(data).with_columns(
+        pl.Series("time", rng.integers(0, groups, size=rows))
+    )
+    return frame.fill_nan(None).with_columns(
+        pl.when(pl.int_range(pl.len()).hash(seed).mod(10).eq(0))
+        .then(None)
+        .otherwise(pl.col(f"x{i}"))
+        .alias(f"x{i}")
+        for i in range(columns)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--train-rows", type=int, default=100_000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    names = [f"x{i}" for i in range(args.columns)]
+    train = make_frame(args.train_rows, args.columns, args.groups)
+    steps = [
+        transform.Step("impute", "mean", names),
+        transform.Step("standardize", "zscore", names),
+    ]
+    transformer = transform.Transformer(steps, over="time").fit(train)
+    compiled = CompiledTransformer.from_transformer(transformer)
+    exprs = [
+        transform.impute(pl.col(names), method="mean"),
+        transform.standardize(pl.col(names), method="zscore"),
+    ]
+    print(f"columns={args.columns} groups={args.groups}")
+    for rows in [1, 10, 100]:
+        request = make_frame(rows, args.columns, args.groups, seed=rows)
+        array = request.select(names).to_numpy()
+        keys = request.select("time").rows()
+        record = request.row(0, named=True) if rows == 1 else request.to_dict()
+        cases = {
+            "pipeline": lambda request=request: transform.pipeline(
+                request, list(exprs), over="time"
+            ),
+            "Transformer.transform": lambda request=request: transformer.transform(
+                request
+            ),
+            "compiled frame": lambda request=request: compiled.transform_frame(request),
+            "compiled dict": lambda record=record: compiled.transform_dict(record),
+            "compiled array": lambda array=array, keys=keys: compiled.transform_array(
+                array, keys
+            ),
+        }
+        for name, case in cases.items():
+            seconds = timeit(case, args.repeats)
+            print(
+                f"rows={rows:>3} {name:>22}: {seconds * 1e6:10.1f} us/request "
+                f"{seconds * 1e6 / rows:9.2f} us/row"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Timing and memory helpers shared by the benchmark scripts."""
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+
+
+def timeit(function: Callable[[], object], repeats: int) -> float:
+    """Median wall time of `function` in seconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_isolated(script: str, *args: str) -> dict:
+    """
+    Runs `script` in a fresh interpreter and returns the JSON it prints last.
+    Peak RSS is a process-wide high-water mark, so each measured case gets its
+    own process.
+    """
+    command = [sys.executable, script, *args]
+    output = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
@@ -0,0 +1,61 @@
+"""
+Deterministic synthetic data for the benchmarks.
+
+Every value is a seeded hash of the row number, so any chunk of rows can be
+generated independently. Frames are written to parquet one chunk at a time,
+which keeps generation memory bounded even at 10^8 rows.
+"""
+
+from pathlib import Path
+
+import polars as pl
+
+CHUNK_CELLS = 50_000_000
+
+
+def feature_names(columns: int) -> list[str]:
+    return [f"x{i}" for i in range(columns)]
+
+
+def unit(expr: pl.Expr, seed: int) -> pl.Expr:
+    return expr.hash(seed).truediv(2.0**64)
+
+
+def synthetic_chunk(start: int, end: int, columns: int, seed: int = 0) -> pl.DataFrame:
+    """
+    Rows `start` to `end` of the synthetic frame:
+        row: Row number.
+        id: Entity id with about 10 rows each (for grouped splits and joins).
+        key: Uniform hash of the row, reduced to any number of groups with `%`.
+        x0, x1, ...: Uniform features with 0-40% nulls; every tenth is constant.
+    """
+    row = pl.col("row")
+    features = []
+    for index, name in enumerate(feature_names(columns)):
+        if index % 10 == 9:
+            features.append(pl.lit(1.0).alias(name))
+            continue
+        value = unit(row, seed + index + 2)
+        null_fraction = (index % 5) / 10
+        features.append(pl.when(value >= null_fraction).then(value).alias(name))
+    return pl.select(pl.int_range(start, end, dtype=pl.Int64).alias("row")).select(
+        row,
+        row.hash(seed).mod(max((end - start) // 10, 1)).add(start // 10).alias("id"),
+        row.hash(seed + 1).alias("key"),
+        *features,
+    )
+
+
+def write_synthetic(
+    directory: Path, rows: int, columns: int, seed: int = 0
+) -> list[Path]:
+    """Writes the synthetic frame as parquet parts; scan them with a glob."""
+    directory.mkdir(parents=True, exist_ok=True)
+    chunk_rows = max(CHUNK_CELLS // max(columns, 1), 1)
+    paths = []
+    for part, start in enumerate(range(0, rows, chunk_rows)):
+        end = min(start + chunk_rows, rows)
+        path = directory / f"part-{part:05d}.parquet"
+        synthetic_chunk(start, end, columns, seed).write_parquet(path)
+        paths.append(path)
+    return paths
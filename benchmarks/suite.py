@@ -0,0 +1,267 @@
+"""
+Scaling benchmarks for the main nanook entry points.
+
+Each (case, mode, size) runs in its own process on synthetic parquet data
+(see `data.py`), and its median wall time and peak RSS are recorded. Modes:
+    eager: the case runs on a DataFrame read beforehand (not timed).
+    lazy: the case runs on a parquet scan and is collected (scan included).
+    streaming: as lazy, collected with the streaming engine.
+
+Save a baseline, then compare later runs against it; the exit status is 1 if
+any case got slower or used more memory than the threshold allows.
+
+    python benchmarks/suite.py --preset small --output baseline.json
+    python benchmarks/suite.py --preset small --baseline baseline.json
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+
+import polars as pl
+from common import run_isolated, timeit
+from data import write_synthetic
+from polars._typing import FrameType
+
+from nanook import preprocess, profiling, transform
+from nanook.frame import (
+    assign_splits,
+    collect_if_lazy,
+    get_column_names,
+    join_dataframes,
+    lazy_sample,
+)
+
+PRESETS: dict[str, list[tuple[int, int]]] = {
+    "small": [(10_000, 10), (100_000, 10), (10_000, 100)],
+    "medium": [(1_000_000, 10), (1_000_000, 100), (10_000_000, 10), (10_000, 1_000)],
+    "large": [(100_000_000, 10), (10_000_000, 100), (100_000, 10_000)],
+}
+MODES = ("eager", "lazy", "streaming")
+METRICS = ("seconds", "peak_rss_mb")
+# Timings below this are mostly noise, so they are never flagged as regressions.
+MIN_SECONDS = 0.01
+
+
+def features(frame: FrameType) -> list[str]:
+    return [name for name in get_column_names(frame) if name.startswith("x")]
+
+
+def with_groups(frame: FrameType, groups: int) -> FrameType:
+    return frame.with_columns(pl.col("key").mod(groups).alias("group"))
+
+
+def equal_splits(count: int) -> dict[str, float]:
+    return {f"split{index}": 1 / count for index in range(count)}
+
+
+def pipeline_case(frame: FrameType, groups: int, **_) -> FrameType:
+    names = features(frame)
+    steps = [
+        transform.Step("impute", "mean", names),
+        transform.Step("standardize", "zscore", names),
+    ]
+    return transform.pipeline(with_groups(frame, groups), list(steps), over="group")
+
+
+def join_case(frame: FrameType, **_) -> FrameType:
+    names = features(frame)
+    tables = [
+        frame.select("row", *names[start::4]) for start in range(min(4, len(names)))
+    ]
+    return join_dataframes(tables, on="row", how="inner")
+
+
+Case = Callable[..., FrameType]
+
+# Each case and the parameters (besides rows and columns) it is swept over.
+CASES: dict[str, tuple[Case, tuple[str, ...]]] = {
+    "assign_splits": (
+        lambda frame, splits, **_: assign_splits(
+            frame, equal_splits(splits), by="id", seed=0
+        ),
+        ("splits",),
+    ),
+    "assign_splits_hash": (
+        lambda frame, splits, **_: assign_splits(
+            frame, equal_splits(splits), by="id", seed=0, method="hash"
+        ),
+        ("splits",),
+    ),
+    "pipeline": (pipeline_case, ("groups",)),
+    "lazy_sample": (
+        lambda frame, **_: lazy_sample(frame.lazy(), fraction=0.01, seed=0),
+        (),
+    ),
+    "join_dataframes": (join_case, ()),
+    "drop_null_columns": (
+        lambda frame, **_: preprocess.drop_null_columns(
+            frame.select(features(frame)), cutoff=0.25
+        ),
+        (),
+    ),
+    "drop_low_variance": (
+        lambda frame, **_: preprocess.drop_low_variance(frame.select(features(frame))),
+        (),
+    ),
+}
+
+
+def run_case(args: argparse.Namespace):
+    """Measures one case in this process and prints its metrics as JSON."""
+    case, _ = CASES[args.case]
+    source = f"{args.path}/*.parquet"
+    parameters = {"groups": args.groups[0], "splits": args.splits[0]}
+    if args.mode == "eager":
+        data = pl.read_parquet(source)
+
+        def function():
+            return collect_if_lazy(case(data, **parameters))
+    else:
+        engine = "streaming" if args.mode == "streaming" else "auto"
+
+        def function():
+            return (
+                case(pl.scan_parquet(source), **parameters)
+                .lazy()
+                .collect(engine=engine)
+            )
+
+    seconds = timeit(function, args.repeats)
+    print(json.dumps({"seconds": seconds, "peak_rss_mb": profiling.peak_rss_mb()}))
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "polars": pl.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": datetime.datetime.now(datetime.UTC).isoformat(),
+    }
+
+
+def result_key(result: dict) -> tuple:
+    return tuple(
+        result[name] for name in ("case", "mode", "rows", "columns", "groups", "splits")
+    )
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> bool:
+    """Prints each result against the baseline; True if any regressed."""
+    previous = {result_key(result): result for result in baseline}
+    regressed = False
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        ratios = {metric: result[metric] / before[metric] for metric in METRICS}
+        if max(result["seconds"], before["seconds"]) < MIN_SECONDS:
+            ratios["seconds"] = 1.0
+        flag = any(ratio > 1 + threshold for ratio in ratios.values())
+        regressed |= flag
+        print(
+            f"{'REGRESSED' if flag else 'ok':>9} {describe(result)}: "
+            f"time {ratios['seconds']:5.2f}x, peak RSS {ratios['peak_rss_mb']:5.2f}x"
+        )
+    return regressed
+
+
+def describe(result: dict) -> str:
+    parameters = "".join(
+        f" {name}={result[name]}"
+        for name in ("groups", "splits")
+        if result[name] is not None
+    )
+    return (
+        f"{result['case']} [{result['mode']}] "
+        f"rows={result['rows']} columns={result['columns']}{parameters}"
+    )
+
+
+def parse_size(value: str) -> tuple[int, int]:
+    rows, columns = value.lower().split("x")
+    return int(float(rows)), int(float(columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--preset", choices=PRESETS, default="small")
+    parser.add_argument(
+        "--sizes", nargs="+", type=parse_size, help="ROWSxCOLUMNS, e.g. 1e6x100"
+    )
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--groups", nargs="+", type=int, default=[100])
+    parser.add_argument("--splits", nargs="+", type=int, default=[3])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Write the results as JSON.")
+    parser.add_argument("--baseline", type=Path, help="Results JSON to compare to.")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case is not None:
+        run_case(args)
+        return
+    results = []
+    for rows, columns in args.sizes or PRESETS[args.preset]:
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic(Path(directory), rows, columns)
+            for name in args.cases:
+                _, swept = CASES[name]
+                values = [
+                    getattr(args, parameter) if parameter in swept else [None]
+                    for parameter in ("groups", "splits")
+                ]
+                for mode, (groups, splits) in itertools.product(
+                    args.modes, itertools.product(*values)
+                ):
+                    measured = run_isolated(
+                        __file__,
+                        *("--case", name, "--mode", mode, "--path", directory),
+                        *("--groups", str(groups or 1), "--splits", str(splits or 1)),
+                        *("--repeats", str(args.repeats)),
+                    )
+                    result = {
+                        "case": name,
+                        "mode": mode,
+                        "rows": rows,
+                        "columns": columns,
+                        "groups": groups,
+                        "splits": splits,
+                    } | measured
+                    results.append(result)
+                    print(
+                        f"{describe(result)}: {result['seconds']:8.3f}s "
+                        f"{result['peak_rss_mb']:10.1f} MiB peak RSS",
+                        flush=True,
+                    )
+    if args.output is not None:
+        report = {"metadata": metadata(), "results": results}
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
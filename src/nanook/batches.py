@@ -0,0 +1,119 @@
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+import numpy as np
+import polars as pl
+from polars._typing import FrameType
+
+from nanook.frame import get_column_names, to_list
+from nanook.typing import BatchFormat
+
+
+def to_format(frame: pl.DataFrame, output: BatchFormat) -> Any:
+    """
+    Converts a batch without copying where the dtypes allow it: Arrow shares
+    Polars' buffers, and a single null-free numeric column becomes a NumPy view.
+    Several columns become one (Fortran-ordered) 2D array.
+    """
+    match output:
+        case "polars":
+            return frame
+        case "arrow":
+            return frame.to_arrow()
+        case "numpy":
+            if frame.width == 1:
+                return frame.to_series().to_numpy()
+            return frame.to_numpy()
+        case _:
+            raise ValueError(
+                f"Unknown output: '{output}'. Choose from: {BatchFormat.__value__}"
+            )
+
+
+def rebatch(
+    chunks: Iterable[pl.DataFrame],
+    batch_size: int,
+    buffer_size: int,
+    shuffle: bool = False,
+    seed: int | None = None,
+) -> Iterator[pl.DataFrame]:
+    """
+    Regroups a stream of frames into batches of `batch_size` rows (the last may
+    be smaller). Chunks are gathered into a buffer of at least `buffer_size`
+    rows, which is shuffled (if `shuffle`) and sliced into batches; leftover
+    rows carry over to the next buffer. Batches are zero-copy slices of the
+    buffer, and memory is bounded by the buffer and one chunk.
+    """
+    rng = np.random.default_rng(seed)
+    buffer: list[pl.DataFrame] = []
+    rows = 0
+
+    def drain(final: bool) -> Iterator[pl.DataFrame]:
+        nonlocal buffer, rows
+        merged = pl.concat(buffer, rechunk=True)
+        if shuffle:
+            merged = merged.sample(
+                fraction=1.0, shuffle=True, seed=int(rng.integers(2**32))
+            )
+        end = merged.height if final else merged.height // batch_size * batch_size
+        for offset in range(0, end, batch_size):
+            yield merged.slice(offset, min(batch_size, end - offset))
+        buffer = [merged.slice(end)]
+        rows = merged.height - end
+
+    for chunk in chunks:
+        buffer.append(chunk)
+        rows += chunk.height
+        if rows >= buffer_size:
+            yield from drain(final=False)
+    if rows:
+        yield from drain(final=True)
+
+
+def iter_batches(
+    frame: FrameType,
+    batch_size: int,
+    features: list[str] | None = None,
+    label: str | list[str] | None = None,
+    shuffle: bool = False,
+    buffer_size: int | None = None,
+    seed: int | None = None,
+    output: BatchFormat = "numpy",
+    drop_last: bool = False,
+) -> Iterator[Any]:
+    """
+    Streams fixed-size mini-batches from a DataFrame/LazyFrame (e.g. a parquet
+    scan or a frame from `split_frames`) for training loops. The plan is run in
+    streaming batches, so the first batch arrives before the whole frame is read
+    and memory stays bounded by the shuffle buffer; nothing is materialized as
+    one array.
+    Args:
+        frame: DataFrame/LazyFrame to read.
+        batch_size: Rows per batch.
+        features: Feature columns; all columns except `label` if None.
+        label: Label column(s); if None, only features are yielded.
+        shuffle: Whether to shuffle rows within the buffer. Rows only move
+            within a buffer, so larger buffers shuffle more thoroughly.
+        buffer_size: Rows to gather before batching; defaults to `batch_size`
+            (`16 * batch_size` when shuffling).
+        seed: Random seed for the shuffle.
+        output: "numpy" (zero-copy views where dtypes allow), "arrow" (Arrow
+            tables sharing Polars' buffers; requires pyarrow) or "polars".
+        drop_last: Whether to drop a final batch smaller than `batch_size`.
+    Yields:
+        Feature batches, or (features, label) pairs if `label` is given.
+    """
+    labels = to_list(label)
+    if features is None:
+        features = [name for name in get_column_names(frame) if name not in labels]
+    if buffer_size is None:
+        buffer_size = batch_size * (16 if shuffle else 1)
+    chunks = frame.lazy().select(*features, *labels).collect_batches()
+    for batch in rebatch(chunks, batch_size, buffer_size, shuffle=shuffle, seed=seed):
+        if drop_last and batch.height < batch_size:
+            return
+        x = to_format(batch.select(features), output)
+        if not labels:
+            yield x
+            continue
+        yield x, to_format(batch.select(labels), output)
@@ -1,10 +1,20 @@
+import asyncio
+import math
 import warnings
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
-from typing import Any
+from itertools import accumulate, pairwise
+from pathlib import Path
+from typing import Any, cast, get_args
 
 import polars as pl
 from polars import selectors as cs
-from polars._typing import FrameType, IntoExpr, JoinStrategy
+from polars._typing import EngineType, FrameType, IntoExpr, JoinStrategy
+from polars.io.partition import FileProviderArgs
+
+from nanook.sketch import QuantileSketch, fit_sketches
+from nanook.typing import BootstrapLayout, SampleMethod, SplitMethod, TimeAnchor
 
 
 def validate_splits(splits: dict[str, float]) -> dict[str, float]:
@@ -23,6 +33,54 @@ def to_expr(value: Any) -> pl.Expr:
             return pl.col(value)
 
 
+def to_list(value: IntoExpr | Iterable[IntoExpr]) -> list[Any]:
+    """
+    A column name or expression, several of them or None (no columns) as a
+    list of names and expressions.
+    """
+    match value:
+        case None:
+            return []
+        case str() | pl.Expr():
+            return [value]
+        case _:
+            return list(value)
+
+
+def hash_unit_interval(expr: pl.Expr, seed: int | None = None) -> pl.Expr:
+    """Maps each row of `expr` to a pseudo-random float in [0, 1) via a seeded hash."""
+    return pl.struct(expr).hash(seed=seed or 0).truediv(2.0**64)
+
+
+def group_positions(
+    by: IntoExpr,
+    stratify_by: IntoExpr,
+    name: str,
+    shuffle: bool,
+    seed: int | None,
+    method: str,
+) -> tuple[pl.Expr, pl.Expr]:
+    """
+    Each row's group position in [0, n_groups) and n_groups, where rows of the
+    same `by` group share a position. "rank" numbers the (shuffled) groups, and
+    "hash" maps each group's seeded hash to [0, 1) with n_groups = 1.
+    """
+    if method == "hash":
+        if stratify_by is not None:
+            raise ValueError("stratify_by is not supported with method='hash'.")
+        by = pl.all().exclude(name) if by is None else to_expr(by)
+        return hash_unit_interval(by, seed=seed), pl.lit(1.0)
+    if method != "rank":
+        raise ValueError(f"Unknown method: '{method}'. Choose from: {SplitMethod}")
+    by = pl.int_range(pl.len()) if by is None else to_expr(by)
+    group_id = pl.struct(by).rank(method="dense").sub(other=1)
+    n_groups = group_id.n_unique()
+    if shuffle:
+        shuffled_id = pl.int_range(n_groups).shuffle(seed=seed)
+        group_id = group_id.replace(group_id.unique(maintain_order=True), shuffled_id)
+    return group_id, n_groups
+
+
 def assign_splits(
     frame: FrameType,
     splits: dict[str, float],
@@ -31,6 +89,7 @@ def assign_splits(
     name: str = "split",
     shuffle: bool = True,
     seed: int | None = None,
+    method: str = "rank",
 ) -> FrameType:
     """
     Assigns splits to a DataFrame/LazyFrame based on the specified proportions and groupings.
@@ -42,17 +101,28 @@ def assign_splits(
         name: Name of the new column to store the assigned splits.
         shuffle: Whether to shuffle the groups before assigning splits.
         seed: Random seed for shuffling the groups.
+        method: "rank" ranks (and shuffles) all groups to hit the proportions exactly.
+            "hash" maps a seeded hash of each `by` key onto the cumulative
+            proportions, so each row is assigned independently: it runs in the
+            streaming engine, chunks or nodes can be processed separately, and a
+            group keeps its split when new data is appended. Proportions then hold
+            in expectation, and assignments are stable for a given Polars version.
+            Without `by`, the hash is taken over all columns of the row.
     Returns:
-        The input DataFrame/LazyFrame with the assigned splits as a new column.
+        The input DataFrame/LazyFrame with the assigned splits as a new column, an
+        `Enum` of the split names (one byte per row for up to 256 splits).
     """
     splits = validate_splits(splits)
     split_list = list(splits.items())
-    by = pl.int_range(pl.len()) if by is None else to_expr(by)
-    group_id = pl.struct(by).rank(method="dense").sub(other=1)
-    n_groups = group_id.n_unique()
-    if shuffle:
-        shuffled_id = pl.int_range(n_groups).shuffle(seed=seed)
-        group_id = group_id.replace(group_id.unique(maintain_order=True), shuffled_id)
+    split_dtype = pl.Enum(list(splits))
+    group_id, n_groups = group_positions(
+        by=by,
+        stratify_by=stratify_by,
+        name=name,
+        shuffle=shuffle,
+        seed=seed,
+        method=method,
+    )
     lower = pl.lit(0)
     expr = pl.when(False).then(None)
     for split, size in split_list[:-1]:
@@ -60,27 +130,598 @@ def assign_splits(
         assignment = group_id.is_between(lower, upper, closed="left")
         if stratify_by is not None:
             assignment = assignment.over(stratify_by)
-        expr = expr.when(assignment).then(pl.lit(split))
+        expr = expr.when(assignment).then(pl.lit(split, dtype=split_dtype))
         lower = upper
-    last_split = pl.lit(split_list[-1][0])
+    last_split = pl.lit(split_list[-1][0], dtype=split_dtype)
     expr = expr.otherwise(last_split)
     return frame.select(expr.alias(name), cs.exclude(name))
 
 
-def join_dataframes(
-    frames: list[FrameType], on: str | list[str] | pl.Expr, how: JoinStrategy
+def assign_folds(
+    frame: FrameType,
+    k: int,
+    by: IntoExpr = None,
+    stratify_by: IntoExpr = None,
+    name: str = "fold",
+    shuffle: bool = True,
+    seed: int | None = None,
+    method: str = "rank",
+) -> FrameType:
+    """
+    Assigns each group to one of `k` cross-validation folds in a single pass.
+    Args:
+        frame: DataFrame/LazyFrame to assign folds to.
+        k: Number of folds.
+        by: Column(s) to group by; all rows of a group share a fold.
+        stratify_by: Column(s) to stratify the folds.
+        name: Name of the new column to store the fold index (0 to k - 1).
+        shuffle: Whether to shuffle the groups before assigning folds.
+        seed: Random seed for shuffling the groups.
+        method: "rank" or "hash", as in `assign_splits`.
+    Returns:
+        The input DataFrame/LazyFrame with the assigned folds as a new column.
+    """
+    if k < 2:
+        raise ValueError(f"k must be at least 2, got {k}.")
+    group_id, n_groups = group_positions(
+        by=by,
+        stratify_by=stratify_by,
+        name=name,
+        shuffle=shuffle,
+        seed=seed,
+        method=method,
+    )
+    fold = group_id.mul(k).truediv(n_groups).floor().cast(pl.Int64)
+    if stratify_by is not None:
+        fold = fold.over(stratify_by)
+    return frame.select(fold.alias(name), cs.exclude(name))
+
+
+def iter_folds(
+    frame: FrameType, k: int, name: str = "fold"
+) -> Iterator[tuple[pl.LazyFrame, pl.LazyFrame]]:
+    """
+    Yields (train, validation) LazyFrames for each fold of `assign_folds`.
+    All of them read one cached base plan, so collecting them together with
+    `pl.collect_all` assigns the folds once rather than once per fold.
+    """
+    base = frame.lazy().cache()
+    for fold in range(k):
+        is_fold = pl.col(name).eq(fold)
+        yield base.filter(~is_fold), base.filter(is_fold)
+
+
+def time_anchors(
+    frame: FrameType, time: str, by: IntoExpr = None, anchor: str = "first"
+) -> FrameType:
+    """
+    The timestamps that temporal assignment compares to its cutoffs: `time`
+    itself, or with `by` one row per group with its first or last timestamp.
+    """
+    if by is None:
+        return frame.select(time)
+    if anchor not in get_args(TimeAnchor.__value__):
+        raise ValueError(
+            f"Unknown anchor: '{anchor}'. Choose from: {TimeAnchor.__value__}"
+        )
+    timestamp = pl.col(time).min() if anchor == "first" else pl.col(time).max()
+    return frame.group_by(by).agg(timestamp)
+
+
+def temporal_cutoffs(
+    frame: FrameType,
+    time: str,
+    proportions: list[float],
+    by: IntoExpr = None,
+    anchor: str = "first",
+    sketch_size: int | None = None,
+) -> list[Any]:
+    """
+    The times at which each block after the first starts, so that consecutive
+    blocks hold `proportions` of the rows (or of the `by` groups, by their first
+    or last timestamp). The cutoffs are quantiles of the timestamps, found
+    without sorting the frame.
+    Args:
+        frame: DataFrame/LazyFrame with a time column.
+        time: Name of the time column (temporal or numeric).
+        proportions: Proportion of each block, in time order.
+        by: Column(s) whose groups are placed whole by their anchor timestamp.
+        anchor: "first" or "last" timestamp of each group.
+        sketch_size: If set, the quantiles are estimated with KLL sketches of
+            this size from streamed batches (see `fit_sketches`), so only a
+            batch of timestamps is in memory at once; otherwise they are exact.
+    """
+    dtype = frame.lazy().collect_schema()[time]
+    total = sum(proportions)
+    bounds = list(accumulate(size / total for size in proportions))[:-1]
+    anchors = time_anchors(frame, time, by=by, anchor=anchor)
+    physical = pl.col(time).to_physical()
+    if sketch_size is None:
+        quantiles = collect_if_lazy(
+            anchors.select(
+                physical.quantile(bound, interpolation="higher").alias(str(index))
+                for index, bound in enumerate(bounds)
+            )
+        ).row(0)
+    else:
+        sketches = fit_sketches(anchors.select(physical), [time], k=sketch_size)
+        sketch = sketches.get((), {}).get(time, QuantileSketch(sketch_size))
+        quantiles = tuple(sketch.quantile(bound) for bound in bounds)
+    if None in quantiles:
+        raise ValueError(f"Column '{time}' has no timestamps to place cutoffs.")
+    values = pl.Series(quantiles, dtype=pl.Float64)
+    physical_dtype = pl.Series(dtype=dtype).to_physical().dtype
+    if physical_dtype.is_integer():
+        values = values.round()
+    return values.cast(physical_dtype).cast(dtype).to_list()
+
+
+def assign_temporal_index(
+    frame: FrameType,
+    time: str,
+    cutoffs: list[Any],
+    name: str,
+    by: IntoExpr = None,
+    anchor: str = "first",
+) -> FrameType:
+    """
+    Numbers each row (or `by` group) by the number of `cutoffs` at or before its
+    (anchor) timestamp, with one binary search per row rather than a sort.
+    Rows (or groups) without a timestamp get a null index.
+    """
+    if any(later < earlier for earlier, later in pairwise(cutoffs)):
+        raise ValueError(f"Cutoffs must be in ascending order, got {cutoffs}.")
+    dtype = frame.lazy().collect_schema()[time]
+    timestamp = pl.col(time)
+    index = pl.lit(pl.Series(cutoffs, dtype=dtype)).search_sorted(
+        timestamp, side="right"
+    )
+    index = pl.when(timestamp.is_not_null()).then(index).alias(name)
+    if by is None:
+        return frame.select(index, cs.exclude(name))
+    # The group keys are materialized under temporary names, so that keys
+    # computed by expressions are joined on their values.
+    exprs = [
+        to_expr(key).name.prefix(f"__key{position}_")
+        for position, key in enumerate(by if isinstance(by, list) else [by])
+    ]
+    keyed = frame.drop(name, strict=False).with_columns(exprs)
+    keys = frame.lazy().select(exprs).collect_schema().names()
+    groups = time_anchors(keyed, time, by=keys, anchor=anchor).select(*keys, index)
+    joined = keyed.join(
+        groups, on=keys, how="left", nulls_equal=True, maintain_order="left"
+    )
+    return joined.select(name, cs.exclude(name, *keys))
+
+
+def assign_temporal_splits(
+    frame: FrameType,
+    time: str,
+    splits: dict[str, float] | None = None,
+    cutoffs: dict[str, Any] | None = None,
+    by: IntoExpr = None,
+    anchor: str = "first",
+    name: str = "split",
+    sketch_size: int | None = None,
+) -> FrameType:
+    """
+    Assigns consecutive time ranges to splits (e.g. train, then val, then test)
+    for forecasting, instead of the random splits of `assign_splits`.
+    Args:
+        frame: DataFrame/LazyFrame to assign splits to.
+        time: Name of the time column (temporal or numeric).
+        splits: Split names and proportions of rows (or groups), in time order;
+            the cutoffs are then quantiles of the timestamps (see
+            `temporal_cutoffs`).
+        cutoffs: Alternatively, split names and the time at which each split
+            starts, in time order; the first split's start is ignored, so it
+            takes everything before the second (e.g. None).
+        by: Column(s) whose groups are kept whole: a group goes to the split of
+            its `anchor` timestamp, so e.g. "first" keeps every entity that
+            appears after a cutoff out of training.
+        anchor: "first" or "last" timestamp of each group.
+        name: Name of the new column to store the assigned splits.
+        sketch_size: Estimate the cutoffs in bounded memory, as in
+            `temporal_cutoffs`.
+    Returns:
+        The input DataFrame/LazyFrame with the assigned splits as a new column, an
+        `Enum` of the split names. Rows (or groups) without a timestamp get null.
+    """
+    if (splits is None) == (cutoffs is None):
+        raise ValueError("Pass exactly one of splits and cutoffs.")
+    if splits is not None:
+        splits = validate_splits(splits)
+        starts = temporal_cutoffs(
+            frame,
+            time,
+            list(splits.values()),
+            by=by,
+            anchor=anchor,
+            sketch_size=sketch_size,
+        )
+        names = list(splits)
+    else:
+        names = list(cast(dict[str, Any], cutoffs))
+        starts = list(cast(dict[str, Any], cutoffs).values())[1:]
+    frame = assign_temporal_index(frame, time, starts, name, by=by, anchor=anchor)
+    # Looks the split names up by index, as integers cannot be cast to Enum in
+    # every Polars version.
+    split_names = pl.lit(pl.Series(names, dtype=pl.Enum(names)))
+    return frame.with_columns(split_names.gather(pl.col(name)).alias(name))
+
+
+def assign_time_blocks(
+    frame: FrameType,
+    time: str,
+    blocks: int,
+    by: IntoExpr = None,
+    anchor: str = "first",
+    name: str = "block",
+    sketch_size: int | None = None,
 ) -> FrameType:
-    return reduce(
-        lambda left, right: left.join(right, how=how, coalesce=True, on=on), frames
+    """
+    Numbers consecutive time ranges holding equal proportions of the rows (or
+    groups) from 0 to `blocks` - 1, for rolling-origin backtests with
+    `iter_rolling_origin`. Arguments are as in `assign_temporal_splits`.
+    """
+    if blocks < 2:
+        raise ValueError(f"blocks must be at least 2, got {blocks}.")
+    starts = temporal_cutoffs(
+        frame, time, [1.0] * blocks, by=by, anchor=anchor, sketch_size=sketch_size
     )
+    return assign_temporal_index(frame, time, starts, name, by=by, anchor=anchor)
+
+
+def iter_rolling_origin(
+    frame: FrameType,
+    blocks: int,
+    name: str = "block",
+    window: int | None = None,
+    horizon: int = 1,
+    min_train: int = 1,
+) -> Iterator[tuple[pl.LazyFrame, pl.LazyFrame]]:
+    """
+    Yields (train, validation) LazyFrames of a rolling-origin backtest over the
+    blocks of `assign_time_blocks`. The origin moves forward one block at a time:
+    each fold trains on the blocks before the origin (all of them, an expanding
+    window, or the last `window`) and validates on the `horizon` blocks from it.
+    As in `iter_folds`, all folds read one cached base plan.
+    Args:
+        frame: DataFrame/LazyFrame with a block column.
+        blocks: Number of blocks.
+        name: Name of the block column.
+        window: Number of blocks to train on; all earlier blocks if None.
+        horizon: Number of blocks to validate on.
+        min_train: Number of blocks before the first origin.
+    """
+    base = frame.lazy().cache()
+    block = pl.col(name)
+    for origin in range(min_train, blocks - horizon + 1):
+        start = 0 if window is None else max(origin - window, 0)
+        train = base.filter(block.is_between(start, origin, closed="left"))
+        validation = base.filter(
+            block.is_between(origin, origin + horizon, closed="left")
+        )
+        yield train, validation
+
 
+def split_frames(
+    frame: FrameType, splits: Iterable[str], name: str = "split"
+) -> dict[str, pl.LazyFrame]:
+    """
+    LazyFrames of each split of `assign_splits`, keyed by split name.
+    All of them read one cached base plan, so collecting them together with
+    `collect_splits` (or `pl.collect_all`) assigns the splits once rather than
+    once per split.
+    Args:
+        frame: DataFrame/LazyFrame with a split column.
+        splits: Split names, e.g. the `splits` passed to `assign_splits`.
+        name: Name of the split column.
+    """
+    base = frame.lazy().cache()
+    return {split: base.filter(pl.col(name).eq(split)) for split in splits}
+
+
+def collect_splits(
+    frames: dict[str, pl.LazyFrame], engine: EngineType = "auto"
+) -> dict[str, pl.DataFrame]:
+    """Collects the LazyFrames of `split_frames` together with `pl.collect_all`."""
+    collected = pl.collect_all(list(frames.values()), engine=engine)
+    return dict(zip(frames, collected))
+
+
+def partition_splits(
+    frame: FrameType, splits: Iterable[str], name: str = "split"
+) -> dict[str, pl.DataFrame]:
+    """
+    Eager variant of `split_frames`: collects `frame` once and partitions it by
+    split in a single pass. Splits without rows get an empty DataFrame.
+    """
+    df = collect_if_lazy(frame)
+    partitions = df.partition_by(name, as_dict=True, maintain_order=True)
+    return {split: partitions.get((split,), df.clear()) for split in splits}
+
+
+def sink_splits(
+    frame: FrameType,
+    path: str | Path,
+    name: str = "split",
+    hive: bool = True,
+    include_key: bool = False,
+    compression: str = "zstd",
+    compression_level: int | None = None,
+    row_group_size: int | None = None,
+    max_rows_per_file: int | None = None,
+    engine: EngineType = "streaming",
+) -> None:
+    """
+    Writes each split of `frame` to its own parquet dataset in one pass.
+    The upstream plan (scan, transforms, split assignment) runs once and every
+    row is routed to the file of its split, rather than filtering and sinking
+    the frame once per split.
+    Args:
+        frame: DataFrame/LazyFrame with a split column, e.g. from `assign_splits`.
+        path: Directory to write the datasets under.
+        name: Name of the split column.
+        hive: Whether to write `path/{name}={split}/` (readable with hive
+            partitioning) rather than `path/{split}/`.
+        include_key: Whether to keep the split column in the files.
+        compression: Parquet compression codec.
+        compression_level: Level of the compression codec.
+        row_group_size: Rows per parquet row group.
+        max_rows_per_file: Rows per file before a split starts a new file.
+        engine: Polars engine that runs the plan.
+    """
 
-def collect_if_lazy(frame: FrameType) -> pl.DataFrame:
+    def split_path(args: FileProviderArgs) -> str:
+        split = args.partition_keys[name][0]
+        return f"{split}/{args.index_in_partition:08d}.parquet"
+
+    partition = pl.PartitionBy(
+        path,
+        key=name,
+        include_key=include_key,
+        max_rows_per_file=max_rows_per_file,
+        file_path_provider=None if hive else split_path,
+    )
+    frame.lazy().sink_parquet(
+        partition,
+        compression=compression,
+        compression_level=compression_level,
+        row_group_size=row_group_size,
+        mkdir=True,
+        engine=engine,
+    )
+
+
+def estimate_height(frame: FrameType) -> float:
+    """Row count of a DataFrame; unknown (infinite) for a LazyFrame."""
+    return frame.height if isinstance(frame, pl.DataFrame) else float("inf")
+
+
+def is_sorted_on(frame: FrameType, on: list[str]) -> bool:
+    if not isinstance(frame, pl.DataFrame) or len(on) != 1:
+        return False
+    return frame[on[0]].flags["SORTED_ASC"]
+
+
+def is_sorted_by(frame: FrameType, by: str | list[str]) -> bool:
+    """
+    Whether the rows are in lexicographic `by` order, checked with one pass over
+    adjacent rows instead of a sort. Always False for a LazyFrame (use a
+    `presorted` hint instead) and when a `by` column has nulls.
+    """
+    if not isinstance(frame, pl.DataFrame):
+        return False
+    columns = to_list(by)
+    if any(frame[column].null_count() for column in columns):
+        return False
+    if frame[columns[0]].flags["SORTED_ASC"] and len(columns) == 1:
+        return True
+    # Lexicographic (previous <= current), built from the last column inward.
+    in_order = pl.col(columns[-1]).shift() <= pl.col(columns[-1])
+    for column in reversed(columns[:-1]):
+        before = pl.col(column).shift()
+        in_order = (before < pl.col(column)) | ((before == pl.col(column)) & in_order)
+    # The first row has no previous row.
+    return bool(frame.select(in_order.fill_null(True).all()).item())
+
+
+def join_order(
+    frames: list[FrameType], how: JoinStrategy, sizes: list[float] | None = None
+) -> list[int]:
+    """
+    Order in which to join `frames`. Inner joins start from the smallest
+    estimated inputs so intermediates stay small; other strategies keep the
+    given order because the first frame drives the result (and key
+    cardinalities are not estimated).
+    """
+    if how != "inner":
+        return list(range(len(frames)))
+    sizes = sizes or [estimate_height(frame) for frame in frames]
+    return sorted(range(len(frames)), key=lambda index: sizes[index])
+
+
+def join_pair(
+    left: FrameType, right: FrameType, on: list[str], how: JoinStrategy, presorted: bool
+) -> FrameType:
+    frame = left.join(right, how=how, coalesce=True, on=on, maintain_order="left")
+    # Unmatched rows of a full join are appended, so only other joins stay sorted.
+    if presorted and how != "full":
+        # Rows sorted by several keys are only sorted by the first of them.
+        frame = frame.with_columns(pl.col(on[0]).set_sorted())
+    return frame
+
+
+def join_balanced(
+    frames: list[FrameType], on: list[str], how: JoinStrategy, presorted: bool
+) -> FrameType:
+    """Joins adjacent pairs until one frame remains, so the join tree is balanced."""
+    while len(frames) > 1:
+        pairs = zip(frames[::2], frames[1::2])
+        joined = [join_pair(left, right, on, how, presorted) for left, right in pairs]
+        frames = joined + frames[len(joined) * 2 :]
+    return frames[0]
+
+
+def joined_columns(
+    frames: list[FrameType], keys: list[str] | pl.Expr, how: JoinStrategy
+) -> list[str] | None:
+    """
+    Output columns of a coalesced join of `frames` on `keys`, or None if the join
+    cannot be reordered: the strategy is not inner/left/full, the keys are
+    expressions, or frames share non-key columns (whose suffixes depend on order).
+    """
+    if how not in ("inner", "left", "full") or not isinstance(keys, list):
+        return None
+    if not all(isinstance(key, str) for key in keys):
+        return None
+    schemas = [frame.lazy().collect_schema().names() for frame in frames]
+    others = [name for names in schemas[1:] for name in names if name not in keys]
+    if len(set(others) | set(schemas[0])) != len(others) + len(schemas[0]):
+        return None
+    return schemas[0] + others
+
+
+def join_dataframes(
+    frames: list[FrameType],
+    on: str | list[str] | pl.Expr,
+    how: JoinStrategy,
+    sizes: list[float] | None = None,
+    presorted: bool = False,
+) -> FrameType:
+    """
+    Joins a list of DataFrames/LazyFrames on common key column(s).
+
+    When the key is given by name and the frames share no other column names,
+    the joins are planned: inner joins run from the smallest to the largest
+    estimated input, and full joins are combined as a balanced tree instead of
+    a left-deep chain. Left joins stay a left-deep chain in the given order:
+    each join keeps the first frame's rows in place, whereas a balanced
+    full-join tree of the other frames joined once onto the first took longer
+    and about twice the peak memory for unique keys (see
+    `benchmarks/bench_join.py`). Frames flagged as sorted on `on` (or all
+    frames if `presorted`) keep their sorted flag through every join so Polars
+    can use its sorted merge-join path. Otherwise the frames are joined
+    left-deep in the given order. Columns are always returned in the given
+    order, while rows follow the first frame joined.
+    Args:
+        frames: DataFrames/LazyFrames to join.
+        on: Key column(s) to join on.
+        how: Join strategy.
+        sizes: Estimated row counts of the frames, e.g. from parquet metadata.
+            Defaults to the height of DataFrames; LazyFrames count as unknown.
+        presorted: Whether all frames are sorted by `on`.
+    Returns:
+        The joined DataFrame/LazyFrame.
+    """
+    keys = to_list(on)
+    columns = joined_columns(frames, keys, how)
+    if columns is None:
+        return reduce(
+            lambda left, right: left.join(right, how=how, coalesce=True, on=on),
+            frames,
+        )
+    keys = cast(list[str], keys)
+    presorted = presorted or all(is_sorted_on(frame, keys) for frame in frames)
+    if presorted:
+        frames = [frame.with_columns(pl.col(keys[0]).set_sorted()) for frame in frames]
+    if how == "full":
+        joined = join_balanced(frames, keys, how, presorted)
+    else:
+        ordered = [frames[index] for index in join_order(frames, how, sizes)]
+        joined = reduce(
+            lambda left, right: join_pair(left, right, keys, how, presorted), ordered
+        )
+    return joined.select(columns)
+
+
+def collect_concurrent(
+    frames: list[FrameType],
+    max_concurrency: int | None = None,
+    engine: EngineType = "auto",
+) -> list[pl.DataFrame]:
+    """
+    Collects independent frames (e.g. separate parquet/IPC scans) from a thread
+    pool, at most `max_concurrency` at a time (all at once if None). Polars
+    releases the GIL while collecting, so I/O latency overlaps and the wall time
+    approaches that of the slowest source rather than the sum of all of them.
+    DataFrames are returned as is, and results keep the order of `frames`.
+    """
+    lazy = [
+        index for index, frame in enumerate(frames) if isinstance(frame, pl.LazyFrame)
+    ]
+    results = [cast(pl.DataFrame, frame) for frame in frames]
+    if not lazy:
+        return results
+    workers = len(lazy) if max_concurrency is None else max(max_concurrency, 1)
+    with ThreadPoolExecutor(max_workers=min(workers, len(lazy))) as executor:
+        collected = executor.map(
+            lambda index: cast(pl.LazyFrame, frames[index]).collect(engine=engine),
+            lazy,
+        )
+        for index, frame in zip(lazy, collected):
+            results[index] = frame
+    return results
+
+
+async def collect_concurrent_async(
+    frames: list[FrameType],
+    max_concurrency: int | None = None,
+    engine: EngineType = "auto",
+) -> list[pl.DataFrame]:
+    """
+    Like `collect_concurrent`, but awaits `LazyFrame.collect_async`, so the
+    event loop keeps running (e.g. in a web service) while Polars collects.
+    """
+    workers = len(frames) if max_concurrency is None else max_concurrency
+    limit = asyncio.Semaphore(max(workers, 1))
+
+    async def collect(frame: FrameType) -> pl.DataFrame:
+        if isinstance(frame, pl.DataFrame):
+            return frame
+        async with limit:
+            return await frame.collect_async(engine=engine)
+
+    return list(await asyncio.gather(*(collect(frame) for frame in frames)))
+
+
+def join_dataframes_concurrent(
+    frames: list[FrameType],
+    on: str | list[str] | pl.Expr,
+    how: JoinStrategy,
+    max_concurrency: int | None = None,
+    presorted: bool = False,
+    engine: EngineType = "auto",
+) -> pl.DataFrame:
+    """
+    Collects the inputs with `collect_concurrent` and joins them with
+    `join_dataframes`, which can then plan inner joins from the inputs' actual
+    heights. Arguments are as in those functions.
+    """
+    collected = collect_concurrent(frames, max_concurrency, engine=engine)
+    return join_dataframes(collected, on=on, how=how, presorted=presorted)
+
+
+async def join_dataframes_async(
+    frames: list[FrameType],
+    on: str | list[str] | pl.Expr,
+    how: JoinStrategy,
+    max_concurrency: int | None = None,
+    presorted: bool = False,
+    engine: EngineType = "auto",
+) -> pl.DataFrame:
+    """`join_dataframes_concurrent` with `collect_concurrent_async`."""
+    collected = await collect_concurrent_async(frames, max_concurrency, engine=engine)
+    return join_dataframes(collected, on=on, how=how, presorted=presorted)
+
+
+def collect_if_lazy(frame: FrameType, engine: EngineType = "auto") -> pl.DataFrame:
     match frame:
         case pl.DataFrame():
             return frame
         case pl.LazyFrame():
-            return frame.collect()
+            return frame.collect(engine=engine)
         case _:
             raise ValueError(f"Unsupported type: {type(frame)}.")
 
@@ -103,25 +744,320 @@ def get_column_names(frame: FrameType) -> list[str]:
             raise ValueError(f"Unsupported type: {type(frame)}.")
 
 
+INTEGER_DTYPES: dict[bool, list[pl.DataType]] = {
+    True: [pl.Int8, pl.Int16, pl.Int32, pl.Int64],
+    False: [pl.UInt8, pl.UInt16, pl.UInt32, pl.UInt64],
+}
+
+
+def narrowest_integer(dtype: pl.DataType, minimum: Any, maximum: Any) -> pl.DataType:
+    """The narrowest integer dtype of the same signedness that holds the range."""
+    signed = dtype.is_signed_integer()
+    if minimum is None:
+        return INTEGER_DTYPES[signed][0]
+    for bits, candidate in zip((8, 16, 32, 64), INTEGER_DTYPES[signed]):
+        lower, upper = (
+            (-(2 ** (bits - 1)), 2 ** (bits - 1) - 1) if signed else (0, 2**bits - 1)
+        )
+        if lower <= minimum and maximum <= upper:
+            return candidate
+    return dtype
+
+
+def compact_dtypes(
+    frame: FrameType,
+    max_categories: int = 1024,
+    enum: bool = False,
+    downcast_floats: bool = False,
+) -> dict[str, pl.DataType]:
+    """
+    The narrowest safe dtype of every column that can shrink, from one pass of
+    cheap statistics (and a second over the values of new Enum columns):
+        Integers: The narrowest integer type of the same signedness that holds
+            the column's range.
+        Float64: Float32, if every value is exactly representable (or always,
+            with `downcast_floats`, keeping about 7 significant digits).
+        String: Categorical (or an Enum of the sorted values, with `enum`) if
+            the approximate number of unique values is at most `max_categories`.
+    Other columns are left out. Apply the dtypes with `frame.cast(dtypes)`, e.g.
+    to validation data with those of the training data; note that casting a
+    value outside an Enum's categories raises an error.
+    """
+    schema = frame.lazy().collect_schema()
+    exprs = []
+    for name, dtype in schema.items():
+        column = pl.col(name)
+        if dtype.is_integer():
+            exprs += [
+                column.min().alias(f"{name}:min"),
+                column.max().alias(f"{name}:max"),
+            ]
+        elif dtype == pl.Float64 and not downcast_floats:
+            rounded = column.cast(pl.Float32).cast(pl.Float64)
+            exact = (rounded.eq(column) | column.is_nan()).all()
+            exprs.append(exact.alias(f"{name}:exact"))
+        elif dtype == pl.String:
+            unique = column.drop_nulls().approx_n_unique()
+            exprs.append(unique.alias(f"{name}:n_unique"))
+    statistics = (
+        collect_if_lazy(frame.select(exprs)).row(0, named=True) if exprs else {}
+    )
+    dtypes: dict[str, pl.DataType] = {}
+    categories = []
+    for name, dtype in schema.items():
+        if dtype.is_integer():
+            minimum, maximum = statistics[f"{name}:min"], statistics[f"{name}:max"]
+            narrow = narrowest_integer(dtype, minimum, maximum)
+            if narrow != dtype:
+                dtypes[name] = narrow
+        elif dtype == pl.Float64:
+            if downcast_floats or statistics[f"{name}:exact"]:
+                dtypes[name] = pl.Float32
+        elif dtype == pl.String and statistics[f"{name}:n_unique"] <= max_categories:
+            if enum:
+                categories.append(name)
+            else:
+                dtypes[name] = pl.Categorical()
+    if categories:
+        values = collect_if_lazy(
+            frame.select(pl.col(categories).drop_nulls().unique().sort().implode())
+        ).row(0, named=True)
+        dtypes |= {name: pl.Enum(values[name]) for name in categories}
+    return {name: dtypes[name] for name in schema if name in dtypes}
+
+
+def compact(
+    frame: FrameType,
+    max_categories: int = 1024,
+    enum: bool = False,
+    downcast_floats: bool = False,
+) -> FrameType:
+    """
+    Casts every column to the narrowest safe dtype (see `compact_dtypes`), which
+    often shrinks a frame several times and speeds up filters and group-bys on
+    the converted columns. A LazyFrame is scanned once for the statistics.
+    """
+    dtypes = compact_dtypes(
+        frame, max_categories=max_categories, enum=enum, downcast_floats=downcast_floats
+    )
+    return frame.cast(dtypes)
+
+
+def per_stratum(value: Any, stratify_by: IntoExpr) -> pl.Expr:
+    """A scalar, or a value looked up by stratum from a {stratum: value} mapping."""
+    if not isinstance(value, dict):
+        return pl.lit(value)
+    if not isinstance(stratify_by, str | pl.Expr):
+        raise TypeError("Per-stratum values require a single stratify_by column.")
+    return to_expr(stratify_by).replace_strict(value, default=0)
+
+
 def lazy_sample(
     lf: pl.LazyFrame,
-    n: int | None = None,
-    fraction: float | None = None,
+    n: int | dict[Any, int] | None = None,
+    fraction: float | dict[Any, float] | None = None,
     with_replacement: bool = False,
     shuffle: bool = False,
-    seed: int = 0,
+    seed: int | None = 0,
+    method: str = "exact",
+    by: IntoExpr = None,
+    stratify_by: IntoExpr = None,
 ) -> pl.LazyFrame:
-    sample_kwargs = {
-        "with_replacement": with_replacement,
-        "shuffle": shuffle,
-        "seed": seed,
-    }
-    if fraction is not None:
-        sample_kwargs["fraction"] = fraction
+    """
+    Samples rows from a LazyFrame.
+    Args:
+        lf: LazyFrame to sample from.
+        n: Number of rows (or groups) to sample; defaults to 1 if `fraction` is None.
+        fraction: Fraction of rows (or groups) to sample.
+        with_replacement: Whether to sample with replacement ("exact" only).
+        shuffle: Whether to shuffle the sampled rows instead of keeping their order.
+        seed: Random seed. None draws a new sample on each collect with
+            "exact", and hashes with seed 0 with the other methods.
+        method: "exact" selects the same rows as `DataFrame.sample` with the same
+            seed, by gathering sampled row positions from every column.
+            "bernoulli" keeps each row independently with probability
+            `fraction`, and "reservoir" keeps the `n` rows with the smallest
+            seeded hash of the row index (all rows if there are fewer than `n`).
+            "reservoir" finds the n-th smallest hash from the row count alone,
+            which reads no data columns, and cross-joins it onto the rows. Both
+            then sample with a filter that runs in the streaming engine.
+        by: Column(s) whose groups are sampled whole, by a seeded hash of the key.
+        stratify_by: Column(s) whose strata are each sampled separately. With a
+            single column, `n` or `fraction` may map each stratum to its own
+            value; strata missing from the mapping are not sampled. "bernoulli"
+            samples in expectation in a streaming filter, while the other
+            methods take exact counts per stratum from one windowed rank.
+    Returns:
+        The sampled LazyFrame.
+    """
+    grouped = by is not None or stratify_by is not None
+    if method == "exact" and not grouped:
+        sample_kwargs = {
+            "with_replacement": with_replacement,
+            "shuffle": shuffle,
+            "seed": seed,
+        }
+        if fraction is not None:
+            sample_kwargs["fraction"] = fraction
+        else:
+            sample_kwargs["n"] = n if n is not None else 1
+        # Gathers one sample of row positions from all columns as a struct:
+        # without a seed, `pl.all()` (or unnesting in the expression) would
+        # sample each column separately and misalign the rows.
+        positions = pl.int_range(pl.len()).sample(**sample_kwargs)
+        sample = pl.struct(pl.all()).gather(positions).alias("__sample")
+        return lf.select(sample).unnest("__sample")
+    if method not in get_args(SampleMethod.__value__):
+        raise ValueError(
+            f"Unknown method: '{method}'. Choose from: {SampleMethod.__value__}"
+        )
+    if with_replacement:
+        raise ValueError(
+            "with_replacement requires method='exact' without by or stratify_by."
+        )
+    index = "__idx"
+    rows = lf
+    lf = lf.with_row_index(index)
+    unit = pl.col(index) if by is None else to_expr(by)
+    key = hash_unit_interval(unit, seed=seed)
+    if method == "bernoulli":
+        if fraction is None:
+            raise ValueError("method='bernoulli' requires a fraction.")
+        sampled = lf.filter(key.lt(per_stratum(fraction, stratify_by)))
+    elif grouped:
+        units = key.n_unique()
+        if fraction is not None:
+            limit = per_stratum(fraction, stratify_by).mul(units).floor()
+        else:
+            limit = per_stratum(1 if n is None else n, stratify_by)
+        keep = key.rank(method="dense").le(limit)
+        if stratify_by is not None:
+            keep = keep.over(stratify_by)
+        sampled = lf.filter(keep)
     else:
-        sample_kwargs["n"] = n if n is not None else 1
+        if n is None:
+            raise ValueError("method='reservoir' requires n.")
+        threshold = "__threshold"
+        key = pl.col(index).hash(seed=seed or 0)
+        # Hashes the row positions from the row count of `rows`, since a plan
+        # shared with the indexed rows would be cached in memory for the join.
+        positions = pl.int_range(pl.len(), dtype=pl.get_index_type())
+        thresholds = rows.select(
+            positions.hash(seed=seed or 0).bottom_k(n).max().alias(threshold)
+        )
+        # Keeping the left order stops the filter from becoming an
+        # (in-memory) inequality join.
+        sampled = (
+            lf.join(thresholds, how="cross", maintain_order="left")
+            .filter(key.le(pl.col(threshold)))
+            .drop(threshold)
+        )
+    if shuffle:
+        sampled = sampled.sort(key)
+    return sampled.drop(index)
+
+
+# The Poisson(1) CDF on the range of 64-bit hashes, up to the count where it
+# reaches the top of the range.
+POISSON_THRESHOLDS = [
+    min(int(cdf * 2.0**64), 2**64 - 1)
+    for cdf in accumulate(math.exp(-1.0) / math.factorial(k) for k in range(19))
+]
+# Odd 64-bit constant (the golden ratio) that spreads replicate numbers.
+REPLICATE_MIX = 0x9E3779B97F4A7C15
+
+
+def replicate_mix(replicate: int) -> int:
+    return (replicate + 1) * REPLICATE_MIX % 2**64
+
+
+def poisson_weight(unit: pl.Expr, mix: pl.Expr, seed: int = 0) -> pl.Expr:
+    """
+    A Poisson(1) count for each pair of a unit's hash and a replicate's mix
+    (`replicate_mix`): the inverse CDF at a seeded hash of both, so each pair
+    gets the same count on every run. The count of thresholds at or below the
+    hash is summed from elementwise comparisons, which the streaming engine
+    runs in batches, unlike `search_sorted`.
+    """
+    hashed = unit.xor(mix).hash(seed=seed)
+    return pl.sum_horizontal(
+        hashed.ge(pl.lit(threshold, dtype=pl.UInt64)).cast(pl.UInt8)
+        for threshold in POISSON_THRESHOLDS
+    )
+
+
+def bootstrap(
+    frame: FrameType,
+    n_replicates: int,
+    by: IntoExpr = None,
+    seed: int = 0,
+    layout: BootstrapLayout = "wide",
+    name: str = "weight",
+    drop_zero: bool = True,
+) -> FrameType:
+    """
+    Poisson bootstrap weights for `n_replicates` replicates in one pass. Each
+    row (or `by` group) appears in each replicate a Poisson(1) number of
+    times, which approximates resampling with replacement for large frames.
+    Weights are drawn from a seeded hash of the row index (or the group key)
+    and the replicate, so no rows are sampled and joined back, and a weighted
+    aggregation over all replicates is a single scan:
+
+        weights = cs.starts_with("weight_")
+        bootstrap(frame, 200).select((weights * pl.col("x")).sum() / weights.sum())
+
+    Args:
+        frame: DataFrame/LazyFrame to resample.
+        n_replicates: Number of bootstrap replicates.
+        by: Column(s) whose groups share their weights (a cluster bootstrap);
+            rows are weighted independently if None.
+        seed: Random seed.
+        layout: "wide" adds a UInt8 weight column `{name}_{replicate}` per
+            replicate. "long" repeats each row per replicate with a
+            "replicate" column and a `name` column, for weighted aggregations
+            grouped by replicate. Both layouts draw the same weights.
+        name: Name (or prefix) of the weight column(s).
+        drop_zero: Whether to drop rows with zero weight in the "long" layout
+            (about 37% of them). Keep them e.g. for out-of-bag evaluation.
+    Returns:
+        The frame with weights.
+    """
+    if n_replicates < 1:
+        raise ValueError("n_replicates must be at least 1.")
     index = "__idx"
-    lf = lf.with_columns(pl.int_range(pl.len()).alias(index))
-    sample_idx = lf.select(pl.col(index).sample(**sample_kwargs))
-    sampled = lf.join(sample_idx, on=index).drop(index)
-    return sampled
+    if by is None:
+        frame = frame.with_row_index(index)
+        unit = pl.col(index).hash(seed=seed)
+    else:
+        unit = pl.struct(to_expr(by)).hash(seed=seed)
+    if layout == "wide":
+        weights = [
+            poisson_weight(
+                unit, pl.lit(replicate_mix(replicate), pl.UInt64), seed=seed
+            ).alias(f"{name}_{replicate}")
+            for replicate in range(n_replicates)
+        ]
+        frame = frame.with_columns(weights)
+    elif layout == "long":
+        mix = "__mix"
+        replicates = pl.DataFrame(
+            {
+                "replicate": range(n_replicates),
+                mix: [replicate_mix(replicate) for replicate in range(n_replicates)],
+            },
+            schema={"replicate": pl.UInt32, mix: pl.UInt64},
+        )
+        frame = frame.join(
+            replicates if isinstance(frame, pl.DataFrame) else replicates.lazy(),
+            how="cross",
+            maintain_order="left",
+        )
+        weight = poisson_weight(unit, pl.col(mix), seed=seed)
+        frame = frame.with_columns(weight.alias(name)).drop(mix)
+        if drop_zero:
+            frame = frame.filter(pl.col(name) > 0)
+    else:
+        raise ValueError(
+            f"Unknown layout: '{layout}'. Choose from: {BootstrapLayout.__value__}"
+        )
+    return frame.drop(index) if by is None else frame
@@ -1,25 +1,370 @@
+from dataclasses import dataclass
+from typing import Self
+
+import numpy as np
 import polars as pl
 import polars.selectors as cs
 from polars._typing import FrameType
 
-from nanook.frame import collect_if_lazy
+from nanook.frame import collect_if_lazy, get_column_names, lazy_sample
+
+PROFILE_SCHEMA = {
+    "column": pl.String,
+    "count": pl.Int64,
+    "null_count": pl.Int64,
+    "mean": pl.Float64,
+    "m2": pl.Float64,
+    "min": pl.Float64,
+    "max": pl.Float64,
+    "n_unique": pl.Int64,
+    "is_constant": pl.Boolean,
+}
+
+
+def column_statistics(expr: pl.Expr, numeric: bool) -> dict[str, pl.Expr]:
+    statistics = {
+        "count": expr.count(),
+        "null_count": expr.null_count(),
+        "n_unique": expr.drop_nulls().n_unique(),
+    }
+    if numeric:
+        statistics |= moment_statistics(expr)
+    return statistics
+
+
+MOMENTS = ("count", "null_count", "mean", "m2", "min", "max")
+
+
+def moment_statistics(expr: pl.Expr) -> dict[str, pl.Expr]:
+    """Aggregations of the `MOMENTS` of a numeric expression."""
+    values = expr.cast(pl.Float64)
+    return {
+        "count": expr.count(),
+        "null_count": expr.null_count(),
+        "mean": values.mean(),
+        "m2": values.sub(values.mean()).pow(2).sum(),
+        "min": values.min(),
+        "max": values.max(),
+    }
+
+
+def merge_sides(left: pl.Expr, right: pl.Expr, merged: pl.Expr) -> pl.Expr:
+    """`left` or `right` when only that side has values, otherwise `merged`."""
+    return (
+        pl.when(pl.col("count_right").fill_null(0) == 0)
+        .then(left)
+        .when(pl.col("count").fill_null(0) == 0)
+        .then(right)
+        .otherwise(merged)
+    )
+
+
+def merged_moments() -> list[pl.Expr]:
+    """
+    Merges the `MOMENTS` of two partitions of the same data joined side by side
+    (the right side suffixed "_right") with the formulas of Chan et al.
+    """
+
+    def right(name: str) -> pl.Expr:
+        return pl.col(f"{name}_right")
+
+    n_left = pl.col("count").fill_null(0)
+    n_right = right("count").fill_null(0)
+    n = n_left + n_right
+    delta = right("mean") - pl.col("mean")
+    mean = pl.col("mean") + delta * n_right / n
+    m2 = pl.col("m2") + right("m2") + delta.pow(2) * n_left * n_right / n
+    return [
+        n.alias("count"),
+        pl.col("null_count").fill_null(0).add(right("null_count").fill_null(0)),
+        merge_sides(pl.col("mean"), right("mean"), mean).alias("mean"),
+        merge_sides(pl.col("m2"), right("m2"), m2).alias("m2"),
+        pl.min_horizontal("min", right("min")).alias("min"),
+        pl.max_horizontal("max", right("max")).alias("max"),
+    ]
+
+
+def with_derived_statistics(stats: pl.DataFrame) -> pl.DataFrame:
+    n = pl.col("count")
+    return stats.with_columns(
+        pl.col("null_count").truediv(n + pl.col("null_count")).alias("null_fraction"),
+        pl.when(n > 1).then(pl.col("m2").truediv(n - 1)).alias("variance"),
+    )
+
+
+@dataclass
+class ColumnProfile:
+    """
+    Per-column statistics for screening columns, computed in one aggregation.
+
+    `stats` has one row per column with the non-null count, null count and
+    fraction, distinct non-null values, whether the column is constant, and for
+    numeric columns the mean, sum of squared deviations (m2), variance, min and
+    max. Filters select columns from `stats` without scanning the frame again.
+    """
 
+    stats: pl.DataFrame
 
-def select_by_condition(frame: FrameType, condition: pl.Expr) -> FrameType:
-    condition_df = collect_if_lazy(frame.select(condition).unpivot())
-    columns_to_keep = condition_df.filter(pl.col("value"))["variable"]
+    @classmethod
+    def from_frame(cls, frame: FrameType) -> Self:
+        schema = frame.lazy().collect_schema()
+        exprs = []
+        for index, (column, dtype) in enumerate(schema.items()):
+            statistics = column_statistics(pl.col(column), numeric=dtype.is_numeric())
+            exprs.extend(
+                expr.alias(f"{index}:{name}") for name, expr in statistics.items()
+            )
+        row = collect_if_lazy(frame.select(exprs)).row(0, named=True) if exprs else {}
+        records = []
+        for index, column in enumerate(schema.names()):
+            record = {"column": column}
+            for name in PROFILE_SCHEMA:
+                record.setdefault(name, row.get(f"{index}:{name}"))
+            record["is_constant"] = record["n_unique"] <= 1
+            records.append(record)
+        stats = pl.DataFrame(records, schema=PROFILE_SCHEMA)
+        return cls(with_derived_statistics(stats))
+
+    def merge(self, other: Self) -> Self:
+        """
+        Combines the profiles of two partitions of the same data (Chan et al.).
+        Counts, mean, m2, min, max and numeric constant-ness are merged exactly.
+        `n_unique` becomes a lower bound. A non-numeric column seen in both
+        partitions is not constant if either has several distinct values, and
+        otherwise its `is_constant` becomes null (unknown).
+        """
+        joined = self.stats.select(list(PROFILE_SCHEMA)).join(
+            other.stats.select(list(PROFILE_SCHEMA)),
+            on="column",
+            how="full",
+            coalesce=True,
+            maintain_order="left_right",
+        )
+
+        minimum = pl.min_horizontal(pl.col("min"), pl.col("min_right"))
+        maximum = pl.max_horizontal(pl.col("max"), pl.col("max_right"))
+        n_unique = pl.max_horizontal("n_unique", "n_unique_right")
+        is_constant = (
+            pl.when(n_unique > 1)
+            .then(False)
+            .when(minimum.is_not_null())
+            .then(minimum == maximum)
+        )
+        stats = joined.select(
+            "column",
+            *merged_moments(),
+            n_unique.alias("n_unique"),
+            merge_sides(
+                pl.col("is_constant"), pl.col("is_constant_right"), is_constant
+            ).alias("is_constant"),
+        )
+        return type(self)(with_derived_statistics(stats))
+
+    def update(self, frame: FrameType) -> Self:
+        """Profiles a new partition of data and merges it into this profile."""
+        return self.merge(type(self).from_frame(frame))
+
+    def columns(self, condition: pl.Expr) -> list[str]:
+        """Names of the columns whose statistics satisfy `condition`."""
+        return self.stats.filter(condition)["column"].to_list()
+
+
+def select_by_condition(
+    frame: FrameType,
+    condition: pl.Expr,
+    batch_size: int | None = None,
+    parallel: int | None = None,
+) -> FrameType:
+    """
+    Keeps the columns for which `condition` (an aggregation over `pl.all()`,
+    returning one boolean per column) is true.
+    Args:
+        frame: DataFrame/LazyFrame to filter.
+        condition: Boolean aggregation, e.g. `pl.all().var().gt(0)`.
+        batch_size: If set, the condition is evaluated over chunks of this many
+            columns, and only the names of surviving columns are collected. On
+            very wide frames this keeps plans small and bounds the memory of the
+            aggregation by the columns of the chunks being evaluated.
+        parallel: Chunks evaluated at once (with `pl.collect_all`). Defaults to
+            all chunks for a DataFrame, whose columns are already in memory, and
+            to one for a LazyFrame, so only one chunk of columns is read at once.
+    """
+    if batch_size is None:
+        condition_df = collect_if_lazy(frame.select(condition).unpivot())
+        columns_to_keep = condition_df.filter(pl.col("value"))["variable"]
+        return frame.select(cs.by_name(columns_to_keep))
+    names = get_column_names(frame)
+    plans = [
+        frame.lazy().select(names[start : start + batch_size]).select(condition)
+        for start in range(0, len(names), batch_size)
+    ]
+    if parallel is None:
+        parallel = len(plans) if isinstance(frame, pl.DataFrame) else 1
+    parallel = max(parallel, 1)
+    columns_to_keep = [
+        name
+        for start in range(0, len(plans), parallel)
+        for result in pl.collect_all(plans[start : start + parallel])
+        for name, keep in zip(result.columns, result.row(0))
+        if keep
+    ]
     return frame.select(cs.by_name(columns_to_keep))
 
 
-def drop_null_columns(frame: FrameType, cutoff: float) -> FrameType:
+def select_by_profile(
+    frame: FrameType, profile: ColumnProfile, condition: pl.Expr
+) -> FrameType:
+    return frame.select(cs.by_name(profile.columns(condition)))
+
+
+def drop_null_columns(
+    frame: FrameType,
+    cutoff: float,
+    profile: ColumnProfile | None = None,
+    batch_size: int | None = None,
+    parallel: int | None = None,
+) -> FrameType:
+    if profile is not None:
+        condition = pl.col("null_fraction").lt(cutoff)
+        return select_by_profile(frame=frame, profile=profile, condition=condition)
     is_null = pl.all().null_count().truediv(pl.len()).lt(cutoff)
-    return select_by_condition(frame=frame, condition=is_null)
+    return select_by_condition(
+        frame=frame, condition=is_null, batch_size=batch_size, parallel=parallel
+    )
 
 
 def filter_null_rows(frame: FrameType, columns: pl.Expr) -> FrameType:
     return frame.filter(~pl.all_horizontal(columns.is_null()))
 
 
-def drop_low_variance(frame: FrameType, cutoff: float = 1e-8) -> FrameType:
+def drop_low_variance(
+    frame: FrameType,
+    cutoff: float = 1e-8,
+    profile: ColumnProfile | None = None,
+    batch_size: int | None = None,
+    parallel: int | None = None,
+) -> FrameType:
+    if profile is not None:
+        condition = pl.col("variance").gt(cutoff)
+        return select_by_profile(frame=frame, profile=profile, condition=condition)
     has_zero_variance = pl.all().var().gt(cutoff)
-    return select_by_condition(frame=frame, condition=has_zero_variance)
+    return select_by_condition(
+        frame=frame,
+        condition=has_zero_variance,
+        batch_size=batch_size,
+        parallel=parallel,
+    )
+
+
+def drop_constant_columns(
+    frame: FrameType,
+    profile: ColumnProfile | None = None,
+    batch_size: int | None = None,
+    parallel: int | None = None,
+) -> FrameType:
+    if profile is not None:
+        # Keeps columns whose constant-ness is unknown after a merge.
+        condition = pl.col("is_constant").not_().fill_null(True)
+        return select_by_profile(frame=frame, profile=profile, condition=condition)
+    is_varying = pl.all().drop_nulls().n_unique().gt(1)
+    return select_by_condition(
+        frame=frame, condition=is_varying, batch_size=batch_size, parallel=parallel
+    )
+
+
+def unit_columns(
+    frame: pl.DataFrame, columns: list[str], mean: np.ndarray, norm: np.ndarray
+) -> np.ndarray:
+    """
+    `columns` as a float32 array of mean-imputed, centered, unit-norm columns, so
+    the dot product of two columns is their correlation (float32 is ample for
+    comparing it to a cutoff and halves the work). Constant columns are zero.
+    """
+    values = frame.select(pl.col(columns).cast(pl.Float32)).to_numpy()
+    scale = np.where(norm > 0, norm, np.inf).astype(np.float32)
+    values = (values - mean.astype(np.float32)) / scale
+    values[np.isnan(values)] = 0.0
+    return values
+
+
+def correlated_pairs(
+    frame: pl.DataFrame, columns: list[str], cutoff: float, block_size: int = 256
+) -> list[tuple[str, str, float]]:
+    """
+    Pairs of `columns` whose absolute Pearson correlation exceeds `cutoff`.
+    The correlation matrix is computed one pair of column blocks at a time, so
+    memory is bounded by two (rows, `block_size`) arrays rather than all columns
+    and the full matrix. Nulls are mean-imputed.
+    """
+    if not columns:
+        return []
+    moments = frame.select(
+        expr.alias(f"{column}:{name}")
+        for column in columns
+        for name, expr in moment_statistics(pl.col(column)).items()
+        if name in ("mean", "m2")
+    ).row(0)
+    mean = np.array(moments[::2], dtype=np.float64)
+    norm = np.sqrt(np.array(moments[1::2], dtype=np.float64))
+    starts = range(0, len(columns), block_size)
+
+    def block(start: int) -> np.ndarray:
+        end = start + block_size
+        return unit_columns(frame, columns[start:end], mean[start:end], norm[start:end])
+
+    pairs = []
+    for index, start in enumerate(starts):
+        left = block(start)
+        for other in starts[index:]:
+            right = left if other == start else block(other)
+            correlation = left.T @ right
+            for row, column in zip(*np.nonzero(np.abs(correlation) > cutoff)):
+                if other == start and column <= row:
+                    continue
+                pair = (columns[start + row], columns[other + column])
+                pairs.append((*pair, float(correlation[row, column])))
+    return pairs
+
+
+def drop_correlated(
+    frame: FrameType,
+    cutoff: float = 0.95,
+    columns: cs.Selector | None = None,
+    sample: int | None = None,
+    seed: int | None = 0,
+    block_size: int = 256,
+) -> FrameType:
+    """
+    Drops columns that are highly correlated with an earlier column.
+    Columns are visited in frame order, and each is kept unless its absolute
+    correlation with a column already kept exceeds `cutoff`, so the result is
+    deterministic and favors earlier columns.
+    Args:
+        frame: DataFrame/LazyFrame to prune.
+        cutoff: Absolute Pearson correlation above which a column is redundant.
+        columns: Columns to consider; all numeric columns if None. Other columns
+            are always kept.
+        sample: If set, correlations are estimated on a seeded sample of this
+            many rows (see `lazy_sample`).
+        seed: Random seed for the row sample.
+        block_size: Columns per block of the correlation matrix.
+    """
+    selected = frame.lazy().select(cs.numeric() if columns is None else columns)
+    names = selected.collect_schema().names()
+    if not names:
+        return frame
+    if sample is not None:
+        selected = lazy_sample(selected, n=sample, seed=seed, method="reservoir")
+    pairs = correlated_pairs(selected.collect(), names, cutoff, block_size)
+    neighbors: dict[str, set[str]] = {name: set() for name in names}
+    for left, right, _ in pairs:
+        neighbors[left].add(right)
+        neighbors[right].add(left)
+    kept: set[str] = set()
+    dropped = []
+    for name in names:
+        if neighbors[name] & kept:
+            dropped.append(name)
+        else:
+            kept.add(name)
+    return frame.drop(dropped)
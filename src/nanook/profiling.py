@@ -0,0 +1,94 @@
+import sys
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import polars as pl
+
+
+def proc_status_mb(field: str) -> float | None:
+    """A memory field of /proc/self/status (Linux) in MiB, None if unavailable."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb() -> float | None:
+    """Resident set size of this process in MiB, where /proc exists."""
+    return proc_status_mb("VmRSS")
+
+
+def peak_rss_mb() -> float | None:
+    """
+    Peak resident set size of this process in MiB. The high-water mark in /proc
+    is preferred: `ru_maxrss` is inherited across fork and exec, so a process
+    started by a larger one would report its parent's peak.
+    """
+    peak = proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KiB elsewhere.
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def sample_peak_rss[T](
+    function: Callable[[], T], interval: float = 0.005
+) -> tuple[T, float | None]:
+    """
+    Runs `function` while a thread samples the resident set size every
+    `interval` seconds (Polars releases the GIL while it collects).
+    Returns:
+        The result of `function` and the highest RSS sampled in MiB, which may
+        miss shorter peaks between samples (None where RSS is unavailable).
+    """
+    peak = rss_mb()
+    if peak is None:
+        return function(), None
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(interval):
+            peak = max(peak, rss_mb() or 0.0)
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+        result = function()
+    finally:
+        done.set()
+        thread.join()
+    return result, max(peak, rss_mb() or 0.0)
+
+
+def profile_collect(
+    frame: pl.LazyFrame,
+) -> tuple[pl.DataFrame, float, list[dict[str, Any]] | None]:
+    """
+    Collects `frame` and times it.
+    Returns:
+        The collected DataFrame, the time in seconds (including optimization)
+        and the time of each node of the plan, from `LazyFrame.profile`. Polars
+        2.0 removed `profile`, so there the frame is collected with the default
+        engine and node timings are None.
+    """
+    if not hasattr(pl.LazyFrame, "profile"):
+        start = time.perf_counter()
+        result = frame.collect()
+        return result, time.perf_counter() - start, None
+    result, timings = frame.profile()
+    nodes = timings.select(
+        "node", pl.col("end").sub(pl.col("start")).truediv(1e6).alias("seconds")
+    ).to_dicts()
+    return result, timings["end"].max() / 1e6, nodes
@@ -0,0 +1,159 @@
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any, Self
+
+import numpy as np
+import polars as pl
+
+from nanook.frame import to_list
+from nanook.transform import METHOD_STATISTICS, Transformer, statistic_name
+
+# The fitted statistics each method reads, as (shift, scale) of an affine map
+# `(x - shift) / scale`; imputation methods have a fill value instead.
+AFFINE_STATISTICS: dict[str, tuple[str, str | tuple[str, str]]] = {
+    "minmax": ("min", ("max", "min")),
+    "zscore": ("mean", "std"),
+    "robust": ("median", ("q75", "q25")),
+}
+
+
+def safe_scale(scale: np.ndarray) -> np.ndarray:
+    return np.where(scale == 0.0, 1.0, scale)
+
+
+@dataclass
+class CompiledTransformer:
+    """
+    A fitted `Transformer` compiled to NumPy arrays for low-latency serving.
+
+    Every step becomes either a fill (imputation) or an affine map
+    `(x - shift) / scale`, stored as arrays with one row per `over` group (plus
+    a row of NaN for unseen groups, which yield missing values as in
+    `Transformer.transform`) and one column per transformed column. Consecutive
+    affine maps are fused, so a call is a handful of vectorized operations with
+    no query plan to build or optimize. Missing values are NaN (or None).
+    Args:
+        columns: Transformed columns, in array order.
+        keys: The `over` columns.
+        groups: Row of each `over` group key in the operation arrays.
+        operations: ("fill", values, values) or ("affine", shift, scale) pairs.
+    """
+
+    columns: list[str]
+    keys: list[str]
+    groups: dict[tuple[Any, ...], int]
+    operations: list[tuple[str, np.ndarray, np.ndarray]]
+
+    @classmethod
+    def from_transformer(cls, transformer: Transformer) -> Self:
+        statistics = transformer.statistics
+        if statistics is None:
+            raise ValueError("Transformer must be fitted before compiling.")
+        over = transformer.over
+        keys = to_list(over)
+        columns = list(
+            dict.fromkeys(c for step in transformer.steps for c in step.columns)
+        )
+        position = {column: index for index, column in enumerate(columns)}
+        groups = {
+            key: row for row, key in enumerate(statistics.select(keys).iter_rows())
+        }
+        if not keys:
+            groups = {(): 0}
+        shape = (len(groups) + 1, len(columns))
+
+        def values(index: int, column: str, statistic: str) -> np.ndarray:
+            name = statistic_name(index, column, statistic)
+            array = statistics[name].cast(pl.Float64).to_numpy()
+            # The last row stands for unseen groups.
+            return np.append(array, np.nan)
+
+        operations: list[tuple[str, np.ndarray, np.ndarray]] = []
+        for index, step in enumerate(transformer.steps):
+            method = step.method
+            if method not in AFFINE_STATISTICS:
+                (statistic,) = METHOD_STATISTICS[method]
+                fill = np.full(shape, np.nan)
+                for column in step.columns:
+                    fill[:, position[column]] = values(index, column, statistic)
+                operations.append(("fill", fill, fill))
+                continue
+            shift_name, scale_names = AFFINE_STATISTICS[method]
+            shift, scale = np.zeros(shape), np.ones(shape)
+            for column in step.columns:
+                shift[:, position[column]] = values(index, column, shift_name)
+                if isinstance(scale_names, tuple):
+                    upper, lower = scale_names
+                    span = values(index, column, upper) - values(index, column, lower)
+                else:
+                    span = values(index, column, scale_names)
+                scale[:, position[column]] = safe_scale(span)
+            if operations and operations[-1][0] == "affine":
+                # ((x - a) / b - c) / d == (x - (a + c * b)) / (b * d)
+                _, previous_shift, previous_scale = operations.pop()
+                shift = previous_shift + shift * previous_scale
+                scale = previous_scale * scale
+            operations.append(("affine", shift, scale))
+        return cls(columns, keys, groups, operations)
+
+    def group_rows(self, keys: Sequence[tuple[Any, ...]] | None, n: int) -> np.ndarray:
+        if not self.keys:
+            return np.zeros(n, dtype=np.intp)
+        if keys is None:
+            raise ValueError(f"Group keys for {self.keys} are required.")
+        unseen = len(self.groups)
+        return np.fromiter(
+            (self.groups.get(key, unseen) for key in keys), dtype=np.intp, count=n
+        )
+
+    def transform_array(
+        self, x: np.ndarray, keys: Sequence[tuple[Any, ...]] | None = None
+    ) -> np.ndarray:
+        """
+        Transforms a (rows, `columns`) array.
+        Args:
+            x: Values of `columns` for each row; NaN marks missing values.
+            keys: The `over` key tuple of each row (required if `keys` is set).
+        Returns:
+            A new float64 array of the same shape.
+        """
+        x = np.array(x, dtype=np.float64, ndmin=2)
+        rows = self.group_rows(keys, x.shape[0])
+        single = not self.keys
+        for kind, first, second in self.operations:
+            first = first[0] if single else first[rows]
+            if kind == "fill":
+                x = np.where(np.isnan(x), first, x)
+            else:
+                second = second[0] if single else second[rows]
+                x = (x - first) / second
+        return x
+
+    def transform_dict(self, record: Mapping[str, Any]) -> dict[str, Any]:
+        """
+        Transforms a record of scalars (one row) or equal-length sequences.
+        Columns that are not transformed are passed through unchanged.
+        """
+        x = np.array([record[column] for column in self.columns], dtype=np.float64).T
+        scalar = x.ndim == 1
+        keys = None
+        if self.keys:
+            key_values = [record[key] for key in self.keys]
+            keys = [tuple(key_values)] if scalar else list(zip(*key_values))
+        x = self.transform_array(x, keys)
+        if scalar:
+            values = dict(zip(self.columns, x[0].tolist()))
+        else:
+            values = dict(zip(self.columns, x.T))
+        return dict(record) | values
+
+    def transform_frame(self, frame: pl.DataFrame) -> pl.DataFrame:
+        """Transforms a (small) DataFrame, replacing the transformed columns."""
+        x = frame.select(pl.col(self.columns).cast(pl.Float64)).to_numpy()
+        keys = frame.select(self.keys).rows() if self.keys else None
+        x = self.transform_array(x, keys)
+        values = [
+            pl.Series(column, x[:, index], nan_to_null=True)
+            for index, column in enumerate(self.columns)
+        ]
+        return frame.with_columns(values)
@@ -0,0 +1,114 @@
+from collections.abc import Iterable
+from typing import Any, Self
+
+import numpy as np
+import polars as pl
+from polars._typing import FrameType
+
+
+class QuantileSketch:
+    """
+    A KLL quantile sketch: bounded memory, mergeable and fed in batches.
+
+    Values are stored in levels of compactors, where an item at level h stands
+    for 2**h input values. When a level exceeds its capacity it is sorted and
+    every other item (from a random offset) is promoted to the next level.
+    Memory is O(k log(n / k)) and the rank error is roughly 1.7 / k, so `k`
+    trades accuracy for memory. Quantiles are exact until the first compaction.
+    Args:
+        k: Capacity of the top level; larger values are more accurate.
+        seed: Random seed for the compaction offsets.
+    """
+
+    def __init__(self, k: int = 200, seed: int | None = 0):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.levels: list[np.ndarray] = [np.empty(0)]
+        self.count = 0
+
+    def capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def compress(self):
+        while any(
+            items.size > self.capacity(level) for level, items in enumerate(self.levels)
+        ):
+            for level, items in enumerate(self.levels):
+                if items.size <= self.capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                odd = items.size % 2
+                promoted = items[odd:][self.rng.integers(2) :: 2]
+                self.levels[level] = items[:odd]
+                self.levels[level + 1] = np.concatenate(
+                    [self.levels[level + 1], promoted]
+                )
+
+    def update(self, values: Iterable[float] | np.ndarray) -> Self:
+        """Adds values to the sketch in place."""
+        values = np.asarray(values, dtype=np.float64)
+        self.count += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> Self:
+        """Adds the contents of another sketch (e.g. of another partition) in place."""
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.compress()
+        return self
+
+    def quantile(self, q: float) -> float | None:
+        if self.count == 0:
+            return None
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q))
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(level.size, 2**h) for h, level in enumerate(self.levels)]
+        )
+        order = np.argsort(items)
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        return float(items[order][min(index, items.size - 1)])
+
+
+def fit_sketches(
+    frame: FrameType,
+    columns: list[str],
+    over: str | list[str] | None = None,
+    k: int = 200,
+    seed: int | None = 0,
+    chunk_size: int | None = None,
+) -> dict[tuple[Any, ...], dict[str, QuantileSketch]]:
+    """
+    Streams `frame` in batches and sketches the non-null values of each column.
+    Only one batch and the sketches are held in memory at a time.
+    Returns:
+        A sketch per column for each `over` group, keyed by the group's key tuple
+        (the empty tuple when `over` is None).
+    """
+    # Imported here since nanook.frame imports this module.
+    from nanook.frame import to_list
+
+    sketches: dict[tuple[Any, ...], dict[str, QuantileSketch]] = {}
+    keys = to_list(over)
+    batches = (
+        frame.lazy().select(*keys, *columns).collect_batches(chunk_size=chunk_size)
+    )
+    for batch in batches:
+        groups = batch.partition_by(keys, as_dict=True) if keys else {(): batch}
+        for key, group in groups.items():
+            group_sketches = sketches.setdefault(key, {})
+            for column in columns:
+                values = group[column].drop_nulls().cast(pl.Float64).to_numpy()
+                sketch = group_sketches.setdefault(column, QuantileSketch(k, seed))
+                sketch.update(values)
+    return sketches
@@ -0,0 +1,440 @@
+import io
+import json
+import os
+import re
+import warnings
+from collections.abc import Callable
+from functools import cache
+from pathlib import Path
+from typing import Any, cast
+
+import polars as pl
+from polars._typing import FrameType
+
+from nanook.frame import collect_if_lazy, to_list
+from nanook.sketch import fit_sketches
+
+FALLBACK_COLOR = re.compile(r'COLOR="([^"]+)">⬤</FONT> in-memory engine fallback')
+GRAPH_NODE = re.compile(
+    r'^\S+ \[label="((?:[^"\\]|\\.)*)"(?:,style=filled,fillcolor="([^"]*)")?\];$',
+    re.MULTILINE,
+)
+# Polars 2.0 names physical temporaries `_POLARS_TMP_PHYS_<n>`.
+TEMPORARY_NAME = re.compile(r"_POLARS_TMP(?:_PHYS)?_\d+")
+# Warnings are attributed to the first caller outside this package.
+PACKAGE_PREFIX = str(Path(__file__).parent) + os.sep
+
+# Fields of each elementwise node of a serialized expression that hold its
+# child expressions (None if the node's value is its only child).
+ELEMENTWISE_CHILDREN: dict[str, tuple[str | int, ...] | None] = {
+    "Column": (),
+    "Selector": (),
+    "Literal": (),
+    "BinaryExpr": ("left", "right"),
+    "Ternary": ("predicate", "truthy", "falsy"),
+    "Cast": ("expr",),
+    "Alias": (0,),
+    "RenameAlias": ("expr",),
+    "KeepName": None,
+    "Function": ("input",),
+}
+
+ELEMENTWISE_FUNCTIONS = {
+    "Abs",
+    "Ceil",
+    "Clip",
+    "Exp",
+    "FillNull",
+    "Floor",
+    "Log",
+    "Negate",
+    "Pow",
+    "Round",
+    "Sign",
+    "Boolean.IsBetween",
+    "Boolean.IsFinite",
+    "Boolean.IsInfinite",
+    "Boolean.IsNan",
+    "Boolean.IsNotNan",
+    "Boolean.IsNotNull",
+    "Boolean.IsNull",
+    "Boolean.Not",
+}
+
+# Aggregations that ignore nulls, and the field holding their input (None if
+# the aggregation's value is its input).
+AGGREGATION_INPUTS: dict[str, str | int | None] = {
+    "Min": "input",
+    "Max": "input",
+    "Mean": None,
+    "Sum": None,
+    "Std": 0,
+    "Var": 0,
+    "Median": None,
+    "Quantile": "expr",
+}
+# Aggregations serialized as functions (Polars 2.0 serializes quantiles this
+# way), whose first input is the aggregated expression.
+AGGREGATION_FUNCTIONS = {"Quantile"}
+
+
+def streaming_fallbacks(frame: FrameType) -> list[str]:
+    """
+    Nodes of the streaming engine's physical plan for `frame` that fall back to
+    the in-memory engine, which holds their whole input in memory. Each node is
+    described by its label (operation and expressions), as in `show_graph`,
+    with numbered temporary names made equal so that labels can be compared
+    between plans. Raises if the graph's format is not recognized.
+    """
+    graph = frame.lazy().show_graph(
+        engine="streaming", plan_stage="physical", raw_output=True, show=False
+    )
+    nodes = GRAPH_NODE.findall(graph or "")
+    color = FALLBACK_COLOR.search(graph or "")
+    # The DOT output of `show_graph` is not a stable API: without its nodes or
+    # the legend's fallback color, no fallbacks could be found.
+    if not nodes or color is None:
+        raise RuntimeError(
+            f"The physical plan graph of Polars {pl.__version__} is not recognized: "
+            f"{(graph or '')[:200]!r}"
+        )
+    return [
+        TEMPORARY_NAME.sub("_POLARS_TMP", label)
+        .replace("\\n", "\n")
+        .replace('\\"', '"')
+        .strip()
+        for label, fill in nodes
+        if fill == color.group(1)
+    ]
+
+
+def placeholder_frame(schema: pl.Schema) -> pl.LazyFrame:
+    """
+    Two null rows of each column in `schema`, to plan queries on without data.
+    Unlike an empty frame or `clear`, its columns are not flagged as sorted,
+    which would let the planner choose sorted group-bys.
+    """
+    return pl.LazyFrame(
+        [pl.Series(name, [None, None], dtype=dtype) for name, dtype in schema.items()]
+    )
+
+
+def to_node(expr: pl.Expr) -> Any:
+    return json.loads(expr.meta.serialize(format="json"))
+
+
+def from_node(node: Any) -> pl.Expr:
+    return pl.Expr.deserialize(io.StringIO(json.dumps(node)), format="json")
+
+
+def unrecognized(node: Any) -> ValueError:
+    return ValueError(
+        f"Unrecognized serialized expression node in Polars {pl.__version__}: "
+        f"{json.dumps(node)[:200]}"
+    )
+
+
+@cache
+def check_serialization() -> None:
+    """
+    Raises if the serialized form of a filtered mean, which `join_aggregations`
+    rewrites, is not recognized: the JSON form of expressions is not a stable
+    API, so another Polars version may change it.
+    """
+    probe = pl.col("x").filter(pl.col("y").is_not_null()).mean().abs()
+    if map_elementwise(to_node(probe), streamable_aggregation) is None:
+        raise RuntimeError(
+            f"The serialized expressions of Polars {pl.__version__} are not "
+            "supported by `join_aggregations` (used by `out_of_core`)."
+        )
+
+
+def function_name(function: Any) -> str:
+    name = function if isinstance(function, str) else next(iter(function))
+    if name == "Boolean":
+        return f"{name}.{function_name(function[name])}"
+    return name
+
+
+def map_elementwise(
+    node: Any,
+    aggregation: Callable[[Any], Any | None],
+    selector: Callable[[Any], Any] | None = None,
+) -> Any | None:
+    """
+    Maps the aggregations (and selectors) of a serialized expression, or
+    returns None if the expression is not elementwise around its aggregations
+    or `aggregation` returns None. Raises on nodes of an unrecognized shape.
+    """
+    if isinstance(node, str):
+        # A variant without fields, such as `pl.len()`.
+        return None
+    if not isinstance(node, dict) or len(node) != 1:
+        raise unrecognized(node)
+    ((kind, value),) = node.items()
+    if kind == "Function" and "function" not in value:
+        raise unrecognized(node)
+    if kind == "Agg" or (
+        kind == "Function" and function_name(value["function"]) in AGGREGATION_FUNCTIONS
+    ):
+        return aggregation(node)
+    if kind == "Selector" and selector is not None:
+        return selector(node)
+    if kind not in ELEMENTWISE_CHILDREN:
+        return None
+    if (
+        kind == "Function"
+        and function_name(value["function"]) not in ELEMENTWISE_FUNCTIONS
+    ):
+        return None
+    fields = ELEMENTWISE_CHILDREN[kind]
+    if fields == ():
+        return node
+    if fields is None:
+        child = map_elementwise(value, aggregation, selector)
+        return None if child is None else {kind: child}
+    if any(
+        field not in value if isinstance(field, str) else field >= len(value)
+        for field in fields
+    ):
+        raise unrecognized(node)
+    value = value.copy()
+    for field in fields:
+        if isinstance(value[field], list):
+            children = [
+                map_elementwise(child, aggregation, selector) for child in value[field]
+            ]
+            if any(child is None for child in children):
+                return None
+            value[field] = children
+        else:
+            value[field] = map_elementwise(value[field], aggregation, selector)
+            if value[field] is None:
+                return None
+    return {kind: value}
+
+
+def no_aggregation(node: Any) -> None:
+    return None
+
+
+def aggregation_input(node: Any) -> tuple[str, Any] | None:
+    """The kind and input of an aggregation that `streamable_aggregation` handles."""
+    if "Function" in node:
+        value = node["Function"]
+        return function_name(value["function"]), value["input"][0]
+    ((kind, value),) = node["Agg"].items()
+    if kind not in AGGREGATION_INPUTS:
+        return None
+    field = AGGREGATION_INPUTS[kind]
+    return kind, value if field is None else value[field]
+
+
+def with_input(node: Any, source: Any) -> Any:
+    """The aggregation `node` over `source` instead of its input."""
+    if "Function" in node:
+        value = node["Function"]
+        return {"Function": value | {"input": [source, *value["input"][1:]]}}
+    ((kind, value),) = node["Agg"].items()
+    field = AGGREGATION_INPUTS[kind]
+    if field is None:
+        return {"Agg": {kind: source}}
+    value = value.copy()
+    value[field] = source
+    return {"Agg": {kind: value}}
+
+
+def streamable_aggregation(node: Any) -> Any | None:
+    """
+    An aggregation over an elementwise input, with a filter of its input turned
+    into a when/then (which the aggregation skips as nulls), since the streaming
+    group-by runs filters inside aggregations in memory. None if the
+    aggregation is of another kind or over a non-elementwise input.
+    """
+    parts = aggregation_input(node)
+    if parts is None:
+        return None
+    kind, source = parts
+    if isinstance(source, dict) and "Filter" in source:
+        filtered = source["Filter"]
+        values = map_elementwise(filtered["input"], no_aggregation)
+        predicate = map_elementwise(filtered["by"], no_aggregation)
+        if values is None or predicate is None:
+            return None
+        source = to_node(pl.when(from_node(predicate)).then(from_node(values)))
+    elif map_elementwise(source, no_aggregation) is None:
+        return None
+    return with_input(node, source)
+
+
+def literal_quantile(node: Any) -> float | None:
+    kind, _ = cast(tuple[str, Any], aggregation_input(node))
+    if kind == "Median":
+        return 0.5
+    if kind != "Quantile":
+        return None
+    if "Function" in node:
+        quantile = node["Function"]["input"][1]
+    else:
+        quantile = node["Agg"][kind]["quantile"]
+    literal = quantile.get("Literal", {}).get("Dyn", {})
+    quantile = literal.get("Float", literal.get("Int"))
+    return None if quantile is None else float(quantile)
+
+
+def by_name(names: list[str]) -> Any:
+    if len(names) == 1:
+        return {"Column": names[0]}
+    return {"Selector": {"ByName": {"names": names, "strict": True}}}
+
+
+def sketch_quantiles(
+    frame: FrameType,
+    keys: list[str],
+    inputs: list[tuple[pl.Expr, list[str], float]],
+    schema: pl.Schema,
+    k: int,
+) -> pl.DataFrame:
+    """Quantiles of `inputs` (expression, output names, quantile) per group."""
+    columns = [name for _, names, _ in inputs for name in names]
+    selected = frame.lazy().select(*keys, *(expr for expr, _, _ in inputs))
+    sketches = fit_sketches(selected, columns, over=keys or None, k=k)
+    if not keys:
+        sketches.setdefault((), {})
+    records = [
+        dict(zip(keys, key))
+        | {
+            name: sketch[name].quantile(quantile) if name in sketch else None
+            for _, names, quantile in inputs
+            for name in names
+        }
+        for key, sketch in sketches.items()
+    ]
+    output_schema = {key: schema[key] for key in keys} | dict.fromkeys(
+        columns, pl.Float64
+    )
+    return pl.DataFrame(records, schema=output_schema)
+
+
+def warn_window(expr: pl.Expr) -> None:
+    warnings.warn(
+        f"{expr} is not elementwise around its aggregations, so it stays a "
+        "window, which the streaming engine runs in memory.",
+        skip_file_prefixes=(PACKAGE_PREFIX,),
+    )
+
+
+def join_aggregations(
+    frame: FrameType,
+    exprs: list[pl.Expr],
+    over: str | list[str] | None = None,
+    sketch_size: int | None = None,
+) -> tuple[FrameType, list[pl.Expr | None], list[str]]:
+    """
+    Rewrites expressions evaluated over the groups of `over` (or the whole
+    frame if None) into a join of their aggregations, which the streaming
+    engine can run without holding a group in memory: the distinct
+    aggregations of all `exprs` are computed in one group-by, joined onto
+    `frame` by the group keys, and each expression reads them as columns.
+    Expressions that are not elementwise around their aggregations (such as
+    forward fills or ranks) are left as windows, with a warning. Median and
+    quantile aggregations run in memory even in the streaming engine; with
+    `sketch_size`, they are estimated with KLL sketches from streamed batches
+    instead (see `fit_sketches`). Raises if the serialized expressions of the
+    installed Polars version are not recognized.
+    Returns:
+        The frame with the aggregations joined, each expression rewritten to
+        read them (None where it stays a window), and the joined columns, to
+        drop once the expressions are applied.
+    """
+    check_serialization()
+    keys = to_list(over)
+    schema = frame.lazy().collect_schema()
+    template = pl.LazyFrame(schema=schema)
+    # Each distinct aggregation (by its serialized form), as its expression
+    # (or that of its input, if sketched), output names and sketched quantile.
+    aggregations: dict[str, tuple[pl.Expr, list[str], float | None]] = {}
+    rewritten: list[pl.Expr | None] = []
+    for expr in exprs:
+        found = dict(aggregations)
+
+        def aggregation(node: Any, found: dict = found) -> Any | None:
+            node = streamable_aggregation(node)
+            if node is None:
+                return None
+            key = json.dumps(node, sort_keys=True)
+            if key not in found:
+                prefix = f"__agg{len(found)}_"
+                aggregated = from_node(node).name.prefix(prefix)
+                if keys:
+                    outputs = template.group_by(keys).agg(aggregated)
+                else:
+                    outputs = template.select(aggregated)
+                names = outputs.collect_schema().names()[len(keys) :]
+                _, source = cast(tuple[str, Any], aggregation_input(node))
+                quantile = None
+                if sketch_size is not None:
+                    quantile = literal_quantile(node)
+                if quantile is not None:
+                    aggregated = from_node(source).name.prefix(prefix)
+                found[key] = (aggregated, names, quantile)
+            return by_name(found[key][1])
+
+        def selector(node: Any) -> Any:
+            # Selectors would also match the joined columns.
+            return by_name(template.select(from_node(node)).collect_schema().names())
+
+        node = map_elementwise(to_node(expr), aggregation, selector)
+        if node is None:
+            warn_window(expr)
+            rewritten.append(None)
+            continue
+        names = template.select(expr).collect_schema().names()
+        joined_schema = dict(schema) | {
+            name: pl.Float64 for _, columns, _ in found.values() for name in columns
+        }
+        candidate = from_node(node)
+        candidate_names = (
+            pl.LazyFrame(schema=joined_schema)
+            .select(candidate)
+            .collect_schema()
+            .names()
+        )
+        if candidate_names != names:
+            if len(names) != 1:
+                warn_window(expr)
+                rewritten.append(None)
+                continue
+            candidate = candidate.alias(names[0])
+        aggregations = found
+        rewritten.append(candidate)
+
+    statistics: list[FrameType] = []
+    exact = [expr for expr, _, quantile in aggregations.values() if quantile is None]
+    if exact:
+        lazy = frame.lazy()
+        statistics.append(
+            lazy.group_by(keys).agg(exact) if keys else lazy.select(exact)
+        )
+    sketched = [
+        (expr, names, quantile)
+        for expr, names, quantile in aggregations.values()
+        if quantile is not None
+    ]
+    if sketched:
+        statistics.append(
+            sketch_quantiles(frame, keys, sketched, schema, cast(int, sketch_size))
+        )
+    for values in statistics:
+        if isinstance(frame, pl.LazyFrame):
+            values = values.lazy()
+        else:
+            values = collect_if_lazy(values)
+        if keys:
+            frame = frame.join(
+                values, on=keys, how="left", nulls_equal=True, maintain_order="left"
+            )
+        else:
+            frame = frame.join(values, how="cross", maintain_order="left")
+    joined = [name for _, names, _ in aggregations.values() for name in names]
+    return frame, rewritten, joined
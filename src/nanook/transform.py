@@ -1,9 +1,46 @@
+import warnings
+from collections import Counter
+from collections.abc import Callable, Collection, Mapping
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Self, cast, get_args
+
 import polars as pl
 import polars.selectors as cs
-from polars._typing import FrameType, IntoExpr
+from polars._typing import EngineType, FrameType, IntoExpr
 
+from nanook.frame import collect_if_lazy, get_column_names, is_sorted_by, to_list
+from nanook.preprocess import MOMENTS, merged_moments, moment_statistics
+from nanook.profiling import profile_collect, sample_peak_rss
+from nanook.sketch import fit_sketches
+from nanook.streaming import (
+    join_aggregations,
+    placeholder_frame,
+    streaming_fallbacks,
+)
 from nanook.typing import Impute, Standardize
 
+AGGREGATIONS: dict[str, Callable[[pl.Expr], pl.Expr]] = {
+    "count": lambda expr: expr.count(),
+    "mean": lambda expr: expr.mean(),
+    "median": lambda expr: expr.median(),
+    "min": lambda expr: expr.min(),
+    "max": lambda expr: expr.max(),
+    "std": lambda expr: expr.std(ddof=0),
+    "q25": lambda expr: expr.quantile(0.25, interpolation="linear"),
+    "q75": lambda expr: expr.quantile(0.75, interpolation="linear"),
+}
+
+QUANTILES: dict[str, float] = {"median": 0.5, "q25": 0.25, "q75": 0.75}
+
+METHOD_STATISTICS: dict[str, tuple[str, ...]] = {
+    "mean": ("mean",),
+    "median": ("median",),
+    "minmax": ("min", "max"),
+    "zscore": ("mean", "std"),
+    "robust": ("median", "q25", "q75"),
+}
+
 
 def identity[T](value: T) -> T:
     return value
@@ -14,15 +51,33 @@ def safe_divide(numerator: pl.Expr, denominator: pl.Expr) -> pl.Expr:
     return numerator.truediv(denominator)
 
 
+def minmax(expr: pl.Expr, minimum: pl.Expr, maximum: pl.Expr) -> pl.Expr:
+    return safe_divide(expr.sub(minimum), maximum - minimum)
+
+
+def zscore(expr: pl.Expr, mean: pl.Expr, std: pl.Expr) -> pl.Expr:
+    return safe_divide(expr.sub(mean), std)
+
+
+def robust(expr: pl.Expr, median: pl.Expr, q25: pl.Expr, q75: pl.Expr) -> pl.Expr:
+    return safe_divide(expr.sub(median), q75 - q25)
+
+
 def minmax_scale(expr: pl.Expr, train: pl.Expr = cs.numeric()) -> pl.Expr:
-    minimum = train.min()
-    maximum = train.max()
-    difference = maximum - minimum
-    return safe_divide(expr.sub(minimum), difference)
+    return minmax(expr, minimum=train.min(), maximum=train.max())
 
 
 def zscore_scale(expr: pl.Expr, train: pl.Expr = cs.numeric()) -> pl.Expr:
-    return safe_divide(expr.sub(train.mean()), train.std(ddof=0))
+    return zscore(expr, mean=train.mean(), std=train.std(ddof=0))
+
+
+def robust_scale(expr: pl.Expr, train: pl.Expr = cs.numeric()) -> pl.Expr:
+    return robust(
+        expr,
+        median=train.median(),
+        q25=AGGREGATIONS["q25"](train),
+        q75=AGGREGATIONS["q75"](train),
+    )
 
 
 def standardize(expr: pl.Expr, method: str, train: pl.Expr | None = None) -> pl.Expr:
@@ -31,13 +86,24 @@ def standardize(expr: pl.Expr, method: str, train: pl.Expr | None = None) -> pl.
         expr = minmax_scale(expr=expr, train=train)
     elif method == "zscore":
         expr = zscore_scale(expr=expr, train=train)
+    elif method == "robust":
+        expr = robust_scale(expr=expr, train=train)
     else:
         raise ValueError(f"Unknown method: '{method}'. Choose from: {Standardize}")
     return expr
 
 
 def impute(expr: pl.Expr, method: str, train: pl.Expr | None = None) -> pl.Expr:
+    """
+    Fills nulls with a training statistic ("mean", "median") or from neighbouring
+    rows ("interpolate", "forward_fill"). The latter follow row order, so pass
+    `order_by` to `pipeline` (or use `.over(..., order_by=...)`) for unsorted data.
+    """
     train = expr if train is None else train
+    if method == "interpolate":
+        return expr.interpolate()
+    if method in ("forward_fill", "forword_fill"):
+        return expr.forward_fill()
     if method == "mean":
         train = train.mean()
     elif method == "median":
@@ -47,9 +113,828 @@ def impute(expr: pl.Expr, method: str, train: pl.Expr | None = None) -> pl.Expr:
     return expr.fill_null(train)
 
 
-def pipeline(
-    frame: FrameType, transforms: list[pl.Expr], over: IntoExpr | None = None
+def apply_statistics(
+    expr: pl.Expr, method: str, statistics: Mapping[str, pl.Expr]
+) -> pl.Expr:
+    """Applies a method to `expr` using precomputed instead of aggregated statistics."""
+    match method:
+        case "mean" | "median":
+            return expr.fill_null(statistics[method])
+        case "minmax":
+            return minmax(expr, minimum=statistics["min"], maximum=statistics["max"])
+        case "zscore":
+            return zscore(expr, mean=statistics["mean"], std=statistics["std"])
+        case "robust":
+            return robust(
+                expr,
+                median=statistics["median"],
+                q25=statistics["q25"],
+                q75=statistics["q75"],
+            )
+        case _:
+            raise ValueError(f"Unknown method: '{method}'.")
+
+
+@dataclass
+class Step:
+    """
+    A stateful transform whose training statistics can be fitted once and reused.
+    Args:
+        kind: Either "impute" or "standardize".
+        method: An `Impute` or `Standardize` method with fittable statistics.
+        columns: Column(s) to transform.
+    """
+
+    kind: str
+    method: str
+    columns: str | list[str]
+
+    def __post_init__(self):
+        if isinstance(self.columns, str):
+            self.columns = [self.columns]
+        if self.kind == "impute":
+            methods = Impute
+        elif self.kind == "standardize":
+            methods = Standardize
+        else:
+            raise ValueError(
+                f"Unknown kind: '{self.kind}'. Choose from: impute, standardize"
+            )
+        if self.method not in get_args(methods) or self.method not in METHOD_STATISTICS:
+            raise ValueError(f"Unknown method: '{self.method}'. Choose from: {methods}")
+
+
+def statistic_name(index: int, column: str, statistic: str) -> str:
+    return f"__{index}_{column}_{statistic}"
+
+
+def affine_parameters(
+    method: str, get: Callable[[str], pl.Expr]
+) -> tuple[pl.Expr, pl.Expr] | None:
+    """The (shift, scale) of a scaler as in `safe_divide(x - shift, scale)`."""
+    match method:
+        case "minmax":
+            return get("min"), get("max") - get("min")
+        case "zscore":
+            return get("mean"), get("std")
+        case "robust":
+            return get("median"), get("q75") - get("q25")
+    return None
+
+
+def derive_statistic(
+    method: str, statistic: str, get: Callable[[str], pl.Expr], length: pl.Expr
+) -> pl.Expr | None:
+    """
+    A statistic of a column after `method` from statistics of the column before
+    it (`get`) and the number of rows, or None if it must be aggregated. Affine
+    scalers map every statistic exactly (the scale is positive). Imputing with
+    the mean or median keeps the extremes and that statistic, and the moments
+    follow from merging in the filled rows.
+    """
+    parameters = affine_parameters(method, get)
+    if parameters is not None:
+        shift, scale = parameters
+        scale = pl.when(scale.eq(0.0)).then(1.0).otherwise(scale)
+        match statistic:
+            case "count":
+                return get("count")
+            case "std":
+                return get("std") / scale
+        return (get(statistic) - shift) / scale
+    match statistic:
+        case "count":
+            return pl.when(get("count") > 0).then(length).otherwise(0)
+        case "min" | "max":
+            return get(statistic)
+        case _ if statistic == method:
+            return get(statistic)
+        case "std" if method == "mean":
+            return get("std") * (get("count") / length).sqrt()
+        case "mean" | "std":
+            # The filled rows merged in as a group with no variance (Chan et al.).
+            count, median = get("count"), get("median")
+            filled = pl.when(count > 0).then(length - count).otherwise(0)
+            if statistic == "mean":
+                return (count * get("mean") + filled * median) / length
+            shift = (get("mean") - median).pow(2) * count * filled / length
+            return ((count * get("std").pow(2) + shift) / length).sqrt()
+    return None
+
+
+def plan_statistics(
+    steps: list[Step], start: int = 0, skip: Collection[str] = ()
+) -> tuple[list[pl.Expr], list[pl.Expr]]:
+    """
+    Plans the statistics of `steps` (numbered from `start`), each over the
+    output of the steps before it, as symbols (column, steps applied, statistic).
+    Symbols that `derive_statistic` can express through earlier ones are derived
+    instead of aggregated, and each remaining symbol is aggregated once, so the
+    mean that a zscore step reads after mean imputation, for instance, is the
+    imputation's mean. Statistics in `skip` are left out.
+    Returns:
+        The distinct aggregations, and the statistics (named by
+        `statistic_name`) as expressions over the aggregated frame.
+    """
+    methods = {index: step.method for index, step in enumerate(steps, start)}
+    aggregated: list[pl.Expr] = [pl.len().alias("__len")]
+    # Each symbol as an expression inside the aggregation and over its result.
+    symbols: dict[tuple[str, tuple[int, ...], str], tuple[pl.Expr, pl.Expr]] = {}
+    length = (pl.len(), pl.col("__len"))
+
+    def column_expr(column: str, applied: tuple[int, ...]) -> pl.Expr:
+        if not applied:
+            return pl.col(column)
+        *before, index = applied
+        statistics = {
+            statistic: symbol(column, tuple(before), statistic)[0]
+            for statistic in METHOD_STATISTICS[methods[index]]
+        }
+        expr = column_expr(column, tuple(before))
+        return apply_statistics(expr, methods[index], statistics)
+
+    def symbol(
+        column: str, applied: tuple[int, ...], statistic: str
+    ) -> tuple[pl.Expr, pl.Expr]:
+        key = (column, applied, statistic)
+        if key in symbols:
+            return symbols[key]
+        derived = None
+        if applied:
+            *before, index = applied
+            derived = tuple(
+                derive_statistic(
+                    methods[index],
+                    statistic,
+                    lambda name, side=side: symbol(column, tuple(before), name)[side],
+                    length[side],
+                )
+                for side in (0, 1)
+            )
+        if derived is None or derived[0] is None:
+            name = f"__agg{len(aggregated)}"
+            aggregation = AGGREGATIONS[statistic](column_expr(column, applied))
+            aggregated.append(aggregation.alias(name))
+            derived = (aggregation, pl.col(name))
+        symbols[key] = cast(tuple[pl.Expr, pl.Expr], derived)
+        return symbols[key]
+
+    applied: dict[str, tuple[int, ...]] = {}
+    exprs = []
+    for index, step in enumerate(steps, start):
+        for column in step.columns:
+            before = applied.get(column, ())
+            exprs.extend(
+                symbol(column, before, statistic)[1].alias(
+                    statistic_name(index, column, statistic)
+                )
+                for statistic in METHOD_STATISTICS[step.method]
+                if statistic not in skip
+            )
+            applied[column] = (*before, index)
+    return aggregated, exprs
+
+
+def fit_statistics(
+    frame: FrameType,
+    steps: list[Step],
+    over: str | list[str] | None = None,
+    train: pl.Expr | None = None,
+    start: int = 0,
+    skip: Collection[str] = (),
+) -> FrameType:
+    """
+    Aggregates every statistic of `steps` in one (grouped) aggregation, in
+    which statistics shared between steps are computed once (see
+    `plan_statistics`).
+    """
+    if train is not None:
+        frame = frame.filter(train)
+    aggregated, exprs = plan_statistics(steps, start=start, skip=skip)
+    if over is None:
+        return frame.select(aggregated).select(exprs)
+    keys = to_list(over)
+    return frame.group_by(over).agg(aggregated).select(*keys, *exprs)
+
+
+def combine_statistics(
+    statistics: pl.DataFrame | None, other: pl.DataFrame, keys: list[str]
+) -> pl.DataFrame:
+    if statistics is None:
+        return other
+    if not keys:
+        return pl.concat([statistics, other], how="horizontal")
+    return statistics.join(other, on=keys, how="full", coalesce=True, nulls_equal=True)
+
+
+def sketch_statistics(
+    frame: FrameType,
+    steps: list[Step],
+    over: str | list[str] | None = None,
+    train: pl.Expr | None = None,
+    k: int = 200,
+    engine: EngineType = "auto",
+) -> pl.DataFrame:
+    """
+    Like `fit_statistics`, but estimates quantile statistics (median, q25, q75)
+    with KLL sketches of size `k` from streamed batches, so memory is bounded by
+    the batch and sketch sizes instead of the training data of a group. Each
+    step with quantile statistics takes one streaming pass over the output of
+    the steps before it; runs of other steps share one aggregation, collected
+    with `engine`.
+    """
+    if train is not None:
+        frame = frame.filter(train)
+    keys = to_list(over)
+    schema = frame.lazy().collect_schema()
+    statistics: pl.DataFrame | None = None
+
+    def transformed(end: int) -> FrameType:
+        if statistics is None:
+            return frame
+        return apply_steps(frame, steps[:end], statistics, over=over)
+
+    start = 0
+    for index, step in enumerate(steps + [None]):
+        quantiles = [] if step is None else METHOD_STATISTICS[step.method]
+        quantiles = [statistic for statistic in quantiles if statistic in QUANTILES]
+        if step is not None and not quantiles:
+            continue
+        if start < index:
+            exact = fit_statistics(
+                transformed(start), steps[start:index], over, start=start
+            )
+            statistics = combine_statistics(
+                statistics, collect_if_lazy(exact, engine), keys
+            )
+        if step is None:
+            break
+        current = transformed(index)
+        exact = fit_statistics(current, [step], over, start=index, skip=QUANTILES)
+        if get_column_names(exact) != keys:
+            statistics = combine_statistics(
+                statistics, collect_if_lazy(exact, engine), keys
+            )
+        sketches = fit_sketches(current, step.columns, over=over, k=k)
+        if not keys:
+            sketches.setdefault((), {})
+        records = [
+            dict(zip(keys, key))
+            | {
+                statistic_name(index, column, statistic): (
+                    sketch[column].quantile(QUANTILES[statistic])
+                    if column in sketch
+                    else None
+                )
+                for column in step.columns
+                for statistic in quantiles
+            }
+            for key, sketch in sketches.items()
+        ]
+        quantile_schema = {key: schema[key] for key in keys} | {
+            statistic_name(index, column, statistic): pl.Float64
+            for column in step.columns
+            for statistic in quantiles
+        }
+        quantile_frame = pl.DataFrame(records, schema=quantile_schema)
+        statistics = combine_statistics(statistics, quantile_frame, keys)
+        start = index + 1
+    return cast(pl.DataFrame, statistics)
+
+
+def apply_steps(
+    frame: FrameType,
+    steps: list[Step],
+    statistics: pl.DataFrame | pl.LazyFrame,
+    over: str | list[str] | None = None,
 ) -> FrameType:
+    """Applies `steps` with statistics from `fit_statistics` in a single projection."""
+    keys = to_list(over)
+    names = [name for name in get_column_names(statistics) if name not in keys]
+    joined = []
+    if over is None and isinstance(statistics, pl.DataFrame):
+        row = statistics.row(0, named=True)
+        values = {name: pl.lit(row[name]) for name in names}
+    else:
+        joined = names
+        if isinstance(frame, pl.LazyFrame):
+            statistics = statistics.lazy()
+        else:
+            statistics = collect_if_lazy(statistics)
+        if over is None:
+            frame = frame.join(statistics, how="cross", maintain_order="left")
+        else:
+            frame = frame.join(
+                statistics,
+                on=over,
+                how="left",
+                nulls_equal=True,
+                maintain_order="left",
+            )
+        values = {name: pl.col(name) for name in names}
+    current: dict[str, pl.Expr] = {}
+    for index, step in enumerate(steps):
+        for column in step.columns:
+            step_statistics = {
+                statistic: values[statistic_name(index, column, statistic)]
+                for statistic in METHOD_STATISTICS[step.method]
+            }
+            expr = current.get(column, pl.col(column))
+            current[column] = apply_statistics(expr, step.method, step_statistics)
+    exprs = [expr.alias(column) for column, expr in current.items()]
+    return frame.with_columns(exprs).drop(joined)
+
+
+def output_names(frame: pl.LazyFrame, transform: pl.Expr) -> list[str]:
+    return frame.select(transform).collect_schema().names()
+
+
+def depends_on(frame: pl.LazyFrame, transform: pl.Expr, columns: set[str]) -> bool:
+    """
+    Whether `transform` reads any of `columns`, decided from the schema alone.
+    Renaming `columns` either breaks the resolution of an expression that reads
+    them by name or changes the outputs of a selector that matches them.
+    """
+    if not columns:
+        return False
+    renamed = frame.rename({column: f"__{column}" for column in columns})
+    try:
+        return output_names(renamed, transform) != output_names(frame, transform)
+    except pl.exceptions.ColumnNotFoundError:
+        return True
+
+
+type Stage = list[pl.Expr] | list[Step]
+
+
+def plan_stages(frame: FrameType, transforms: list[pl.Expr | Step]) -> list[Stage]:
+    """
+    Groups consecutive transforms that can run in a single projection.
+    Expressions share a stage as long as none of them reads or overwrites a
+    column written earlier in the same stage, so each stage evaluates every
+    window once per `over` key. Consecutive steps always share a stage because
+    their statistics are aggregated together.
+    """
+    template = pl.LazyFrame(schema=frame.lazy().collect_schema())
+    stages: list[Stage] = []
+    written: set[str] = set()
     for transform in transforms:
-        frame = frame.with_columns(transform.over(over))
+        previous = stages[-1] if stages else None
+        if isinstance(transform, Step):
+            if previous and isinstance(previous[0], Step):
+                previous.append(transform)
+                continue
+        elif previous and isinstance(previous[0], pl.Expr):
+            outputs = set(output_names(template, transform))
+            if not outputs & written and not depends_on(template, transform, written):
+                previous.append(transform)
+                written |= outputs
+                continue
+        if previous:
+            template = run_stage(template, previous)
+        if isinstance(transform, pl.Expr):
+            written = set(output_names(template, transform))
+        stages.append([transform])
+    return stages
+
+
+def run_stage(
+    frame: FrameType,
+    stage: Stage,
+    over: IntoExpr | None = None,
+    train: pl.Expr | None = None,
+    order_by: IntoExpr | None = None,
+    out_of_core: bool = False,
+    sketch_size: int | None = None,
+) -> FrameType:
+    if isinstance(stage[0], Step):
+        steps = cast(list[Step], stage)
+        if out_of_core and sketch_size is not None:
+            statistics = sketch_statistics(
+                frame, steps, over=over, train=train, k=sketch_size, engine="streaming"
+            )
+        else:
+            statistics = fit_statistics(frame, steps, over=over, train=train)
+        return apply_steps(frame, steps, statistics, over=over)
+    exprs = cast(list[pl.Expr], stage)
+    joined: list[str] = []
+    rewritten: list[pl.Expr | None] = [None] * len(exprs)
+    if out_of_core:
+        if not isinstance(over, str | list | None):
+            raise ValueError("`out_of_core` requires `over` as column name(s).")
+        frame, rewritten, joined = join_aggregations(frame, exprs, over, sketch_size)
+    if order_by is not None:
+        exprs = [expr.over(over, order_by=order_by) for expr in exprs]
+    elif over is not None:
+        exprs = [expr.over(over) for expr in exprs]
+    exprs = [expr if new is None else new for expr, new in zip(exprs, rewritten)]
+    return frame.with_columns(exprs).drop(joined)
+
+
+def window_order(
+    frame: FrameType,
+    over: IntoExpr | None,
+    order_by: str | list[str] | None,
+    presorted: bool,
+) -> str | list[str] | None:
+    """`order_by`, or None when rows are already sorted by (`over`, `order_by`)."""
+    if order_by is None:
+        return None
+    # Sortedness is only checked by column names.
+    keys = to_list(over) if isinstance(over, str | list | None) else None
+    if presorted or (
+        keys is not None and is_sorted_by(frame, [*keys, *to_list(order_by)])
+    ):
+        return None
+    return order_by
+
+
+STAGE_PROFILE_SCHEMA = {
+    "stage": pl.Int64,
+    "kind": pl.String,
+    "transforms": pl.List(pl.String),
+    "plan": pl.String,
+    "seconds": pl.Float64,
+    "nodes": pl.List(pl.Struct({"node": pl.String, "seconds": pl.Float64})),
+    "rows_in": pl.Int64,
+    "rows_out": pl.Int64,
+    "output_mb": pl.Float64,
+    "peak_rss_mb": pl.Float64,
+}
+
+
+def pipeline(
+    frame: FrameType,
+    transforms: list[pl.Expr | Step],
+    over: IntoExpr | None = None,
+    train: pl.Expr | None = None,
+    order_by: str | list[str] | None = None,
+    presorted: bool = False,
+    out_of_core: bool = False,
+    sketch_size: int | None = None,
+) -> FrameType:
+    """
+    Applies transforms in order, fusing them into as few passes as possible.
+    Independent expressions are evaluated together in one projection, so each
+    stage partitions the frame by `over` once. Consecutive steps are fitted in a
+    single grouped aggregation over the `train` rows and applied through one join
+    and one projection.
+    Args:
+        frame: DataFrame/LazyFrame to transform.
+        transforms: Expressions (e.g. from `impute`/`standardize`) and/or steps.
+        over: Column(s) whose groups are transformed separately.
+        train: Predicate selecting the rows that steps are fitted on.
+        order_by: Column(s) ordering the rows within each group for
+            order-dependent expressions such as interpolation and forward fill.
+            Rows are returned in their original order.
+        presorted: Whether the rows are already sorted by (`over`, `order_by`),
+            so the window sorts can be skipped. Checked for a DataFrame.
+        out_of_core: Whether to compute the statistics of expressions with a
+            streamable group-by joined back on `over` instead of windows, which
+            the streaming engine runs in memory (see `join_aggregations`), so
+            that e.g. `sink_parquet` handles data larger than RAM. Expressions
+            that are not elementwise around their statistics stay windows, with
+            a warning; use `check_streaming` to find what still runs in memory.
+        sketch_size: With `out_of_core`, medians and quantiles (which hold each
+            group's values in memory) are estimated with KLL sketches of this
+            size from streamed batches, which collects them eagerly.
+    Returns:
+        The transformed DataFrame/LazyFrame.
+    """
+    order_by = window_order(frame, over, order_by, presorted)
+    for stage in plan_stages(frame, transforms):
+        frame = run_stage(
+            frame,
+            stage,
+            over=over,
+            train=train,
+            order_by=order_by,
+            out_of_core=out_of_core,
+            sketch_size=sketch_size,
+        )
     return frame
+
+
+STREAMING_SCHEMA = {"stage": pl.Int64, "transform": pl.String, "node": pl.String}
+
+
+def check_streaming(
+    frame: FrameType,
+    transforms: list[pl.Expr | Step],
+    over: IntoExpr | None = None,
+    train: pl.Expr | None = None,
+    order_by: str | list[str] | None = None,
+    presorted: bool = False,
+    out_of_core: bool = False,
+    sketch_size: int | None = None,
+) -> pl.DataFrame:
+    """
+    Finds the nodes of `pipeline` that the streaming engine cannot run and that
+    fall back to the in-memory engine, holding their whole input in memory.
+    Stages are planned as in `pipeline`, and each transform (including each
+    step) is planned on its own after the stages before it, over placeholder
+    rows with the schema of `frame`, so no data is read and keys are not
+    assumed to be sorted.
+    Arguments are as in `pipeline`.
+    Returns:
+        One row per fallback node with the stage and transform that caused it
+        (null for nodes of `frame`'s own plan) and the node's label.
+    """
+    records = [
+        {"stage": None, "transform": None, "node": node}
+        for node in streaming_fallbacks(frame)
+    ]
+    order_by = window_order(frame, over, order_by, presorted)
+    template = placeholder_frame(frame.lazy().collect_schema())
+    run = partial(
+        run_stage,
+        over=over,
+        train=train,
+        order_by=order_by,
+        out_of_core=out_of_core,
+        sketch_size=sketch_size,
+    )
+    # Windows left by `out_of_core` are reported instead of warned about.
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", "(?s).*stays a window")
+        for index, stage in enumerate(plan_stages(frame, transforms)):
+            before = Counter(streaming_fallbacks(template))
+            for transform in stage:
+                part = cast(Stage, [transform])
+                nodes = Counter(streaming_fallbacks(run(template, part)))
+                records.extend(
+                    {"stage": index, "transform": str(transform), "node": node}
+                    for node in (nodes - before).elements()
+                )
+            template = run(template, stage)
+    return pl.DataFrame(records, schema=STREAMING_SCHEMA)
+
+
+def profile_pipeline(
+    frame: FrameType,
+    transforms: list[pl.Expr | Step],
+    over: IntoExpr | None = None,
+    train: pl.Expr | None = None,
+    order_by: str | list[str] | None = None,
+    presorted: bool = False,
+    callback: Callable[[dict[str, Any]], None] | None = None,
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Runs `pipeline` one stage at a time and profiles each stage.
+    Stages are planned exactly as in `pipeline`, but each one is collected with
+    `profile_collect` before the next runs, so the total time is higher than
+    for the fused pipeline. Arguments are as in `pipeline`, plus:
+    Args:
+        callback: Called with each stage's record as soon as the stage finishes,
+            e.g. to forward it to a metrics system.
+    Returns:
+        The transformed DataFrame and one row per stage with its transforms, its
+        optimized plan, time in seconds (including optimization), per-node
+        timings (null on Polars 2.0 and later), rows in and out, estimated output size, and the highest RSS
+        of the process sampled while the stage ran (see `sample_peak_rss`).
+    """
+    order_by = window_order(frame, over, order_by, presorted)
+    records = []
+    rows = frame.height if isinstance(frame, pl.DataFrame) else None
+    for index, stage in enumerate(plan_stages(frame, transforms)):
+        staged = run_stage(
+            frame.lazy(), stage, over=over, train=train, order_by=order_by
+        )
+        plan = staged.explain()
+        (frame, seconds, nodes), peak = sample_peak_rss(
+            partial(profile_collect, staged)
+        )
+        record = {
+            "stage": index,
+            "kind": "steps" if isinstance(stage[0], Step) else "expressions",
+            "transforms": [str(transform) for transform in stage],
+            "plan": plan,
+            "seconds": seconds,
+            "nodes": nodes,
+            "rows_in": rows,
+            "rows_out": frame.height,
+            "output_mb": frame.estimated_size("mb"),
+            "peak_rss_mb": peak,
+        }
+        rows = frame.height
+        records.append(record)
+        if callback is not None:
+            callback(record)
+    return collect_if_lazy(frame), pl.DataFrame(records, schema=STAGE_PROFILE_SCHEMA)
+
+
+RUNNING_SCHEMA = {
+    "column": pl.String,
+    "count": pl.Int64,
+    "null_count": pl.Int64,
+    "mean": pl.Float64,
+    "m2": pl.Float64,
+    "min": pl.Float64,
+    "max": pl.Float64,
+}
+
+
+def scale_moments(
+    moments: dict[str, pl.Expr], shift: pl.Expr, scale: pl.Expr
+) -> dict[str, pl.Expr]:
+    """Moments of `safe_divide(x - shift, scale)` from the moments of `x`."""
+    scale = pl.when(scale.eq(0.0)).then(1.0).otherwise(scale)
+    return moments | {
+        "mean": (moments["mean"] - shift) / scale,
+        "m2": moments["m2"] / scale.pow(2),
+        "min": (moments["min"] - shift) / scale,
+        "max": (moments["max"] - shift) / scale,
+    }
+
+
+def propagate_moments(
+    method: str, moments: dict[str, pl.Expr]
+) -> tuple[dict[str, pl.Expr], dict[str, pl.Expr]]:
+    """
+    The statistics of `method` for a column with `moments`, and the moments of
+    the column after the method is applied. Mean imputation and the affine
+    scalers are exact; methods that need quantiles cannot be derived.
+    """
+    n = moments["count"]
+    match method:
+        case "mean":
+            has_values = n > 0
+            return {"mean": moments["mean"]}, moments | {
+                "count": pl.when(has_values)
+                .then(n + moments["null_count"])
+                .otherwise(n),
+                "null_count": pl.when(has_values)
+                .then(0)
+                .otherwise(moments["null_count"]),
+            }
+        case "minmax":
+            statistics = {"min": moments["min"], "max": moments["max"]}
+            shifted = scale_moments(
+                moments, moments["min"], moments["max"] - moments["min"]
+            )
+            return statistics, shifted
+        case "zscore":
+            std = pl.when(n > 0).then(moments["m2"].truediv(n).sqrt())
+            statistics = {"mean": moments["mean"], "std": std}
+            return statistics, scale_moments(moments, moments["mean"], std)
+        case _:
+            raise ValueError(
+                f"Statistics of '{method}' cannot be derived from running moments."
+            )
+
+
+@dataclass
+class RunningStatistics:
+    """
+    Mergeable per-column moments for refitting steps on appended data.
+
+    `stats` has one row per `over` group and column with the non-null count,
+    null count, mean, sum of squared deviations (m2), min and max. Moments of new
+    data are merged exactly (Chan et al.), so a refit costs one pass over the new
+    partition rather than the whole history. `stats` is a plain DataFrame that
+    can be persisted with `write_parquet` and restored with `read_parquet`.
+    Args:
+        stats: Moments per `over` group and column.
+        over: Column(s) whose groups get separate moments.
+    """
+
+    stats: pl.DataFrame
+    over: str | list[str] | None = None
+
+    @property
+    def keys(self) -> list[str]:
+        return to_list(self.over)
+
+    @classmethod
+    def from_frame(
+        cls,
+        frame: FrameType,
+        columns: list[str],
+        over: str | list[str] | None = None,
+        train: pl.Expr | None = None,
+    ) -> Self:
+        """Computes the moments of `columns` in one (grouped) aggregation."""
+        if train is not None:
+            frame = frame.filter(train)
+        keys = to_list(over)
+        exprs = [
+            expr.alias(f"{column}:{name}")
+            for column in columns
+            for name, expr in moment_statistics(pl.col(column)).items()
+        ]
+        wide = collect_if_lazy(
+            frame.group_by(keys).agg(exprs) if keys else frame.select(exprs)
+        )
+        schema = {key: dtype for key, dtype in wide.schema.items() if key in keys}
+        stats = pl.concat(
+            [
+                wide.select(
+                    *keys,
+                    pl.lit(column).alias("column"),
+                    *(pl.col(f"{column}:{name}").alias(name) for name in MOMENTS),
+                )
+                for column in columns
+            ]
+        ).cast(schema | RUNNING_SCHEMA)
+        return cls(stats, over=over)
+
+    def merge(self, other: Self) -> Self:
+        """Combines the moments of two partitions of the same data."""
+        if self.keys != other.keys:
+            raise ValueError("Cannot merge running statistics with different `over`.")
+        joined = self.stats.join(
+            other.stats,
+            on=[*self.keys, "column"],
+            how="full",
+            coalesce=True,
+            nulls_equal=True,
+            maintain_order="left_right",
+        )
+        stats = joined.select(*self.keys, "column", *merged_moments())
+        return type(self)(stats, over=self.over)
+
+    def update(self, frame: FrameType, train: pl.Expr | None = None) -> Self:
+        """Computes the moments of a new partition and merges them in."""
+        columns = self.stats["column"].unique(maintain_order=True).to_list()
+        return self.merge(type(self).from_frame(frame, columns, self.over, train))
+
+    def step_statistics(self, steps: list[Step]) -> pl.DataFrame:
+        """
+        Statistics of `steps` in the layout of `fit_statistics`, derived from
+        the moments instead of the data. Each step's moments are propagated
+        through the steps before it (see `propagate_moments`).
+        """
+        keys = self.keys or ["__key"]
+        stats = self.stats if self.keys else self.stats.with_columns(__key=0)
+        wide = stats.pivot(on="column", index=keys, values=list(MOMENTS), separator=":")
+        current: dict[str, dict[str, pl.Expr]] = {}
+        exprs = []
+        for index, step in enumerate(steps):
+            for column in step.columns:
+                moments = current.get(column) or {
+                    name: pl.col(f"{name}:{column}") for name in MOMENTS
+                }
+                moments["count"] = moments["count"].fill_null(0)
+                statistics, current[column] = propagate_moments(step.method, moments)
+                exprs.extend(
+                    expr.alias(statistic_name(index, column, statistic))
+                    for statistic, expr in statistics.items()
+                )
+        return wide.select(*self.keys, *exprs)
+
+
+@dataclass
+class Transformer:
+    """
+    Fits the statistics of a sequence of steps once and applies them to any frame.
+
+    `fit` computes every statistic (per column and per `over` group) in a single
+    aggregation over the training rows and stores them in `statistics`.
+    `transform` then applies them with a join on `over` (or literals when `over`
+    is None), so transforming new data never re-scans the training data.
+    Args:
+        steps: Steps to apply in order; each is fitted on the output of the last.
+        over: Column(s) whose groups get separate statistics.
+        sketch_size: If set, quantile statistics are estimated with KLL sketches
+            of this size from streamed batches (see `sketch_statistics`) rather
+            than exact aggregations that hold each group's values in memory.
+        statistics: Fitted statistics, one row per `over` group.
+    """
+
+    steps: list[Step]
+    over: str | list[str] | None = None
+    sketch_size: int | None = None
+    statistics: pl.DataFrame | None = None
+
+    def fit(self, frame: FrameType, train: pl.Expr | None = None) -> Self:
+        """
+        Args:
+            frame: DataFrame/LazyFrame to fit the statistics on.
+            train: Predicate selecting the training rows; all rows are used if None.
+        Returns:
+            The fitted transformer.
+        """
+        if self.sketch_size is not None:
+            self.statistics = sketch_statistics(
+                frame, self.steps, over=self.over, train=train, k=self.sketch_size
+            )
+            return self
+        statistics = fit_statistics(frame, self.steps, over=self.over, train=train)
+        self.statistics = collect_if_lazy(statistics)
+        return self
+
+    def fit_running(self, running: RunningStatistics) -> Self:
+        """
+        Fits the statistics from running moments (see `RunningStatistics`), so a
+        refit after appending data only needs the moments of the new data.
+        """
+        keys = to_list(self.over)
+        if running.keys != keys:
+            raise ValueError("Running statistics must be grouped by the same `over`.")
+        self.statistics = running.step_statistics(self.steps)
+        return self
+
+    def transform(self, frame: FrameType) -> FrameType:
+        if self.statistics is None:
+            raise ValueError("Transformer must be fitted before calling transform.")
+        return apply_steps(frame, self.steps, self.statistics, over=self.over)
@@ -1,4 +1,11 @@
 from typing import Literal, TypeAlias
 
-Standardize: TypeAlias = Literal["minmax", "zscore"]
-Impute: TypeAlias = Literal["mean", "median", "interpolate", "forword_fill"]
+Standardize: TypeAlias = Literal["minmax", "zscore", "robust"]
+Impute: TypeAlias = Literal[
+    "mean", "median", "interpolate", "forward_fill", "forword_fill"
+]
+SplitMethod: TypeAlias = Literal["rank", "hash"]
+type SampleMethod = Literal["exact", "bernoulli", "reservoir"]
+type BootstrapLayout = Literal["wide", "long"]
+type TimeAnchor = Literal["first", "last"]
+type BatchFormat = Literal["numpy", "arrow", "polars"]
@@ -0,0 +1,57 @@
+import numpy as np
+import polars as pl
+import pytest
+from polars import testing
+
+from nanook.batches import iter_batches, rebatch
+
+
+@pytest.fixture
+def data() -> pl.LazyFrame:
+    return pl.LazyFrame(
+        {"a": np.arange(1000, dtype=float), "b": np.arange(1000) * 2.0}
+    ).with_columns(pl.col("a").cast(pl.Int64).alias("y"))
+
+
+def test_rebatch_sizes():
+    chunks = [pl.DataFrame({"a": range(start, start + 7)}) for start in (0, 7, 14)]
+    batches = list(rebatch(chunks, batch_size=5, buffer_size=5))
+    assert [batch.height for batch in batches] == [5, 5, 5, 5, 1]
+    assert pl.concat(batches)["a"].to_list() == list(range(21))
+
+
+def test_iter_batches_numpy(data: pl.LazyFrame):
+    batches = list(iter_batches(data, batch_size=64, label="y"))
+    assert len(batches) == 16
+    x, y = batches[0]
+    assert x.shape == (64, 2) and y.shape == (64,)
+    assert batches[-1][0].shape == (1000 % 64, 2)
+    assert not y.flags.owndata
+    np.testing.assert_array_equal(np.concatenate([y for _, y in batches]), range(1000))
+    dropped = list(iter_batches(data, batch_size=64, label="y", drop_last=True))
+    assert len(dropped) == 15
+
+
+def test_iter_batches_features(data: pl.LazyFrame):
+    batches = list(iter_batches(data, batch_size=100, features=["b"], output="polars"))
+    assert all(batch.columns == ["b"] for batch in batches)
+    testing.assert_frame_equal(pl.concat(batches), data.select("b").collect())
+
+
+def test_iter_batches_shuffle(data: pl.LazyFrame):
+    def labels(seed):
+        batches = iter_batches(
+            data, batch_size=50, label="y", shuffle=True, buffer_size=200, seed=seed
+        )
+        return np.concatenate([y for _, y in batches])
+
+    shuffled = labels(0)
+    assert sorted(shuffled) == list(range(1000))
+    assert not np.array_equal(shuffled, np.arange(1000))
+    np.testing.assert_array_equal(shuffled, labels(0))
+    assert not np.array_equal(shuffled, labels(1))
+
+
+def test_iter_batches_unknown_output(data: pl.LazyFrame):
+    with pytest.raises(ValueError, match="Unknown output"):
+        next(iter_batches(data, batch_size=10, output="torch"))  # type: ignore[arg-type]
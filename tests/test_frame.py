@@ -1,3 +1,11 @@
+import asyncio
+import math
+import re
+import threading
+import time
+from collections.abc import Callable
+from datetime import date, datetime, timedelta
+from functools import partial, reduce
 from typing import cast
 
 import polars as pl
@@ -5,9 +13,10 @@ import pytest
 from hypothesis import HealthCheck, assume, given, settings
 from hypothesis import strategies as st
 from polars import testing
+from polars._typing import JoinStrategy
 from polars.testing import assert_frame_equal
 
-from nanook import frame
+from nanook import frame, streaming
 from nanook.frame import lazy_sample
 
 
@@ -31,6 +40,34 @@ def test_assign_splits(splits: dict[str, float]):
     expected = df.group_by("split").agg(pl.len().truediv(df.height).alias("frac"))
     for split, frac in splits.items():
         assert expected.filter(pl.col("split") == split)["frac"].item() == frac
+    assert df.schema["split"] == pl.Enum(list(splits))
+
+
+def test_compact():
+    df = pl.DataFrame(
+        {
+            "small": [0, -5, 100, None],
+            "wide": [0, 1, 2**40, 3],
+            "unsigned": pl.Series([0, 1, 300, 2], dtype=pl.UInt64),
+            "exact": [0.5, 1.0, None, float("nan")],
+            "inexact": [0.1, 1.0, 2.0, 3.0],
+            "label": ["b", "a", None, "b"],
+            "name": ["w", "x", "y", "z"],
+            "flag": [True, False, True, None],
+        }
+    )
+    dtypes = frame.compact_dtypes(df, max_categories=2)
+    assert dtypes == {
+        "small": pl.Int8,
+        "unsigned": pl.UInt16,
+        "exact": pl.Float32,
+        "label": pl.Categorical(),
+    }
+    result = frame.compact(df.lazy(), max_categories=2, enum=True).collect()
+    assert result.schema["label"] == pl.Enum(["a", "b"])
+    testing.assert_frame_equal(result, df, check_dtypes=False)
+    lossy = frame.compact_dtypes(df, max_categories=2, downcast_floats=True)
+    assert lossy["inexact"] == pl.Float32
 
 
 def test_join_dataframes():
@@ -60,6 +97,303 @@ def test_join_dataframes():
     )
 
 
+def test_assign_folds(df: pl.DataFrame):
+    grouped = df.with_columns(pl.col("id").floordiv(2).alias("group"))
+    result = frame.assign_folds(grouped, k=5, by="group", seed=0)
+    assert result.columns[0] == "fold"
+    assert result.group_by("group").agg(pl.col("fold").n_unique())["fold"].max() == 1
+    assert result["fold"].value_counts()["count"].to_list() == [20] * 5
+    assert sorted(result["fold"].unique().to_list()) == [0, 1, 2, 3, 4]
+
+
+def test_assign_folds_stratified(df: pl.DataFrame):
+    result = frame.assign_folds(df, k=3, stratify_by="category", seed=1)
+    counts = (
+        result.group_by("category", "fold")
+        .len()
+        .pivot("fold", index="category", values="len")
+    )
+    for row in counts.drop("category").iter_rows():
+        assert max(row) - min(row) <= 1
+
+
+def test_assign_folds_hash():
+    lf = pl.LazyFrame({"id": range(3_000)})
+    result = frame.assign_folds(lf, k=3, by="id", seed=2, method="hash")
+    counts = result.collect(engine="streaming")["fold"].value_counts()["count"]
+    assert counts.len() == 3
+    assert (counts.cast(pl.Int64) - 1_000).abs().max() < 100
+    with pytest.raises(ValueError, match="at least 2"):
+        frame.assign_folds(lf, k=1)
+
+
+def test_iter_folds(df: pl.DataFrame):
+    folded = frame.assign_folds(df.lazy(), k=4, by="id", seed=3)
+    pairs = list(frame.iter_folds(folded, k=4))
+    assert len(pairs) == 4
+    collected = pl.collect_all([lf for pair in pairs for lf in pair])
+    for fold, (train, validation) in enumerate(zip(collected[::2], collected[1::2])):
+        assert (validation["fold"] == fold).all()
+        assert (train["fold"] != fold).all()
+        assert train.height + validation.height == df.height
+    assert sum(validation.height for validation in collected[1::2]) == df.height
+
+
+def feature_tables() -> list[pl.DataFrame]:
+    return [
+        pl.DataFrame({"id": range(0, size, step), f"x{index}": range(size // step)})
+        for index, (size, step) in enumerate([(100, 1), (60, 2), (90, 3), (40, 1)])
+    ]
+
+
+def test_join_order():
+    frames = feature_tables()
+    assert frame.join_order(frames, how="inner") == [1, 2, 3, 0]
+    assert frame.join_order(frames, how="left") == [0, 1, 2, 3]
+    lazy = [df.lazy() for df in frames]
+    assert frame.join_order(lazy, how="inner") == [0, 1, 2, 3]
+    assert frame.join_order(lazy, how="inner", sizes=[4, 3, 2, 1]) == [3, 2, 1, 0]
+
+
+@pytest.mark.parametrize("how", ["inner", "left", "full"])
+def test_join_dataframes_planned_matches_sequential(how: JoinStrategy):
+    frames = feature_tables()
+    expected = reduce(
+        lambda left, right: left.join(right, on="id", how=how, coalesce=True), frames
+    )
+    result = frame.join_dataframes(frames, on="id", how=how)
+    assert result.columns == ["id", "x0", "x1", "x2", "x3"]
+    testing.assert_frame_equal(result.sort("id"), expected.sort("id"))
+    lazy = frame.join_dataframes([df.lazy() for df in frames], on="id", how=how)
+    testing.assert_frame_equal(lazy.collect().sort("id"), expected.sort("id"))
+
+
+def test_join_dataframes_presorted():
+    frames = [df.sort("id") for df in feature_tables()]
+    result = frame.join_dataframes(frames, on="id", how="left")
+    assert result["id"].flags["SORTED_ASC"]
+    assert result["id"].is_sorted()
+    lazy = [df.lazy() for df in feature_tables()]
+    result = frame.join_dataframes(lazy, on="id", how="left", presorted=True)
+    assert result.collect()["id"].flags["SORTED_ASC"]
+
+
+def test_join_dataframes_presorted_multiple_keys():
+    left = pl.DataFrame({"k1": [0, 0, 1, 1], "k2": [1, 2, 0, 1], "x": range(4)})
+    right = left.select("k1", "k2", y=pl.col("x") * 10)
+    result = frame.join_dataframes(
+        [left.lazy(), right.lazy()], on=["k1", "k2"], how="left", presorted=True
+    ).collect()
+    assert result["k1"].flags["SORTED_ASC"]
+    assert not result["k2"].flags["SORTED_ASC"]
+    assert result.filter(pl.col("k2") <= 1).height == 3
+    assert result.lazy().filter(pl.col("k2") <= 1).collect().height == 3
+
+
+def test_join_dataframes_on_expression():
+    frames = feature_tables()
+    expected = frame.join_dataframes(frames, on="id", how="left")
+    result = frame.join_dataframes(frames, on=pl.col("id"), how="left")
+    testing.assert_frame_equal(result, expected)
+
+
+def test_join_dataframes_shared_columns_fall_back():
+    df1 = pl.DataFrame({"id": [1, 2], "x": [1, 2]})
+    df2 = pl.DataFrame({"id": [1, 2], "x": [3, 4]})
+    result = frame.join_dataframes([df1, df2], on="id", how="inner")
+    assert result.columns == ["id", "x", "x_right"]
+
+
+@pytest.fixture
+def events() -> pl.DataFrame:
+    days = [1, 5, 2, 3, 4, 9, 6, 7, 8, 10]
+    return pl.DataFrame(
+        {
+            "id": [1, 1, 2, 2, 3, 3, 4, 4, 5, 5],
+            "t": [date(2024, 1, day) for day in days],
+            "x": range(10),
+        }
+    )
+
+
+def test_assign_temporal_splits(events: pl.DataFrame):
+    splits = {"train": 0.6, "val": 0.2, "test": 0.2}
+    result = frame.assign_temporal_splits(events, "t", splits)
+    assert result.schema["split"] == pl.Enum(list(splits))
+    counts = dict(result["split"].value_counts().iter_rows())
+    assert counts == {"train": 6, "val": 2, "test": 2}
+    latest = result.group_by("split").agg(pl.col("t").max()).sort("split")["t"]
+    earliest = result.group_by("split").agg(pl.col("t").min()).sort("split")["t"]
+    assert (latest.head(2) < earliest.tail(2)).all()
+    cutoffs = {"train": None, "val": date(2024, 1, 5), "test": date(2024, 1, 8)}
+    explicit = frame.assign_temporal_splits(events.lazy(), "t", cutoffs=cutoffs)
+    expected = pl.when(pl.col("t") < date(2024, 1, 5)).then(pl.lit("train"))
+    expected = expected.when(pl.col("t") < date(2024, 1, 8)).then(pl.lit("val"))
+    expected = expected.otherwise(pl.lit("test"))
+    testing.assert_series_equal(
+        explicit.collect()["split"],
+        events.select(expected.alias("split"))["split"],
+        check_dtypes=False,
+    )
+    with_null = pl.concat([events, pl.DataFrame({"id": [6], "t": [None], "x": [10]})])
+    assert frame.assign_temporal_splits(with_null, "t", splits)["split"][-1] is None
+    with pytest.raises(ValueError):
+        frame.assign_temporal_splits(events, "t", splits, cutoffs=cutoffs)
+    with pytest.raises(ValueError):
+        reversed_cutoffs = {
+            "train": None,
+            "val": date(2024, 1, 8),
+            "test": date(2024, 1, 5),
+        }
+        frame.assign_temporal_splits(events, "t", cutoffs=reversed_cutoffs)
+
+
+@pytest.mark.parametrize("anchor", ["first", "last"])
+def test_assign_temporal_splits_by_groups(events: pl.DataFrame, anchor: str):
+    splits = {"train": 0.6, "val": 0.2, "test": 0.2}
+    result = frame.assign_temporal_splits(
+        events.lazy(), "t", splits, by="id", anchor=anchor
+    ).collect()
+    assert result.columns == ["split", *events.columns]
+    assert result.group_by("id").agg(pl.col("split").n_unique())["split"].max() == 1
+    groups = result.unique("id")
+    assert dict(groups["split"].value_counts().iter_rows()) == {
+        "train": 3,
+        "val": 1,
+        "test": 1,
+    }
+    anchors = events.group_by("id").agg(
+        pl.col("t").min() if anchor == "first" else pl.col("t").max()
+    )
+    ordered = anchors.join(groups, on="id").sort("t")["split"].to_physical()
+    assert ordered.is_sorted()
+
+
+def test_assign_temporal_splits_by_expression():
+    lf = pl.LazyFrame({"id": [i % 50 for i in range(1_000)], "t": range(1_000)})
+    key = pl.col("id") % 7
+    splits = {"train": 0.5, "test": 0.5}
+    result = frame.assign_temporal_splits(lf, "t", splits, by=key).collect()
+    assert result.columns == ["split", "id", "t"]
+    assert result["split"].dtype == pl.Enum(["train", "test"])
+    assert result["split"].null_count() == 0
+    assert result.group_by(key).agg(pl.col("split").n_unique())["split"].max() == 1
+
+
+def test_temporal_cutoffs_sketch():
+    times = pl.datetime_range(
+        datetime(2024, 1, 1), datetime(2024, 12, 31), "1h", eager=True
+    )
+    lf = pl.LazyFrame({"t": times.shuffle(seed=0)})
+    exact = frame.temporal_cutoffs(lf, "t", [0.5, 0.3, 0.2])
+    sketched = frame.temporal_cutoffs(lf, "t", [0.5, 0.3, 0.2], sketch_size=200)
+    assert exact == [times[times.len() // 2], times[times.len() * 8 // 10]]
+    for estimate, value in zip(sketched, exact):
+        assert abs(estimate - value) < timedelta(days=10)
+
+
+def test_iter_rolling_origin(events: pl.DataFrame):
+    blocks = frame.assign_time_blocks(events, "t", blocks=5)
+    assert blocks["block"].value_counts()["count"].to_list() == [2] * 5
+    folds = list(frame.iter_rolling_origin(blocks, blocks=5))
+    assert len(folds) == 4
+    for origin, (train, validation) in enumerate(folds, 1):
+        assert train.collect()["block"].unique().sort().to_list() == list(range(origin))
+        assert validation.collect()["block"].unique().to_list() == [origin]
+    sliding = frame.iter_rolling_origin(blocks, 5, window=2, horizon=2, min_train=2)
+    ranges = [
+        (
+            train.collect()["block"].unique().sort().to_list(),
+            validation.collect()["block"].unique().sort().to_list(),
+        )
+        for train, validation in sliding
+    ]
+    assert ranges == [([0, 1], [2, 3]), ([1, 2], [3, 4])]
+
+
+@pytest.mark.parametrize("max_concurrency", [None, 0, 2])
+def test_collect_concurrent(max_concurrency: int | None):
+    limit = 3 if max_concurrency is None else max(max_concurrency, 1)
+    running = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def slow(df: pl.DataFrame) -> pl.DataFrame:
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+        return df
+
+    tables = [pl.DataFrame({"id": [1, 2, 3], f"v{i}": [i, i, i]}) for i in range(4)]
+    frames = [table.lazy().map_batches(slow) for table in tables[1:]]
+    frames = [tables[0], *frames]
+    for result in [
+        frame.collect_concurrent(frames, max_concurrency),
+        asyncio.run(frame.collect_concurrent_async(frames, max_concurrency)),
+    ]:
+        assert all(table.equals(other) for table, other in zip(result, tables))
+        assert running["peak"] <= limit
+        running["peak"] = 0
+    expected = frame.join_dataframes(tables, on="id", how="inner")
+    testing.assert_frame_equal(
+        frame.join_dataframes_concurrent(frames, "id", "inner", max_concurrency),
+        expected,
+    )
+    joined = frame.join_dataframes_async(frames, "id", "inner", max_concurrency)
+    testing.assert_frame_equal(asyncio.run(joined), expected)
+
+
+def test_split_frames():
+    splits = {"train": 0.6, "val": 0.2, "test": 0.2, "holdout": 0.0}
+    lf = pl.LazyFrame({"id": range(100)})
+    lf = frame.assign_splits(lf, splits, seed=0)
+    expected = lf.collect()
+    frames = frame.split_frames(lf, splits)
+    assert list(frames) == list(splits)
+    collected = frame.collect_splits(frames)
+    partitioned = frame.partition_splits(lf, splits)
+    for split in splits:
+        rows = expected.filter(pl.col("split").eq(split))
+        testing.assert_frame_equal(frames[split].collect(), rows)
+        testing.assert_frame_equal(collected[split], rows)
+        testing.assert_frame_equal(partitioned[split], rows)
+    assert partitioned["holdout"].height == 0
+    # Collected together, the splits read one cached plan.
+    caches = re.findall(r"CACHE\[id: (\S+)\]", pl.explain_all(list(frames.values())))
+    assert len(caches) == len(splits)
+    assert len(set(caches)) == 1
+
+
+@pytest.mark.parametrize("hive", [True, False])
+def test_sink_splits(tmp_path, hive: bool):
+    lf = pl.LazyFrame({"id": range(100), "x": range(100)})
+    lf = frame.assign_splits(lf, {"train": 0.8, "test": 0.2}, seed=0)
+    frame.sink_splits(lf, tmp_path, hive=hive, max_rows_per_file=50)
+    expected = lf.collect()
+    for split in ["train", "test"]:
+        directory = tmp_path / (f"split={split}" if hive else split)
+        result = pl.read_parquet(directory / "*.parquet", hive_partitioning=False)
+        assert result.columns == ["id", "x"]
+        rows = expected.filter(pl.col("split").eq(split)).drop("split")
+        testing.assert_frame_equal(result.sort("id"), rows.sort("id"))
+    assert len(list((tmp_path / ("split=train" if hive else "train")).iterdir())) == 2
+
+
+def test_is_sorted_by():
+    df = pl.DataFrame({"id": [1, 1, 2, 2], "t": [1, 2, 0, 2], "s": [5, 0, 1, 0]})
+    assert frame.is_sorted_by(df, "id")
+    assert frame.is_sorted_by(df, ["id", "t"])
+    assert frame.is_sorted_by(df, ["id", "t", "s"])
+    assert not frame.is_sorted_by(df, "t")
+    assert not frame.is_sorted_by(df, ["id", "s"])
+    assert frame.is_sorted_by(df.sort("t"), "t")
+    assert not frame.is_sorted_by(df.lazy(), "id")
+    with_nulls = df.with_columns(pl.lit(None, dtype=pl.Int64).alias("t"))
+    assert not frame.is_sorted_by(with_nulls, ["id", "t"])
+
+
 def test_collect_if_lazy():
     df_input = pl.DataFrame({"a": [1]})
     result_df = frame.collect_if_lazy(df_input)
@@ -172,6 +506,46 @@ def test_assign_splits_disjoint_by_groups():
     assert all_split_ids == original_ids, "Some IDs were lost during splitting"
 
 
+def test_assign_splits_hash_proportions():
+    df = pl.DataFrame({"id": pl.int_range(10_000, eager=True).repeat_by(2).explode()})
+    splits = {"train": 0.6, "val": 0.2, "test": 0.2}
+    result = frame.assign_splits(df, splits=splits, by="id", seed=1, method="hash")
+    assert result.group_by("id").agg(pl.col("split").n_unique()).max()[0, 1] == 1
+    counts = result.unique("id")["split"].value_counts(normalize=True)
+    for split, size in splits.items():
+        proportion = counts.filter(pl.col("split") == split)["proportion"].item()
+        assert abs(proportion - size) < 0.02
+
+
+def test_assign_splits_hash_stable_on_append():
+    splits = {"train": 0.5, "test": 0.5}
+    old = pl.LazyFrame({"id": range(100), "value": range(100)})
+    new = pl.LazyFrame({"id": range(50, 150), "value": range(100, 200)})
+    before = frame.assign_splits(old, splits, by="id", seed=3, method="hash")
+    after = frame.assign_splits(
+        pl.concat([old, new]), splits, by="id", seed=3, method="hash"
+    )
+    expected = before.collect().select("id", "split").unique()
+    joined = expected.join(after.collect().select("id", "split"), on="id")
+    assert (joined["split"] == joined["split_right"]).all()
+    streamed = after.collect(engine="streaming")
+    testing.assert_frame_equal(streamed, after.collect(), check_row_order=False)
+
+
+def test_assign_splits_hash_seed_and_errors():
+    df = pl.DataFrame({"id": range(100)})
+    splits = {"a": 0.5, "b": 0.5}
+    first = frame.assign_splits(df, splits, seed=1, method="hash")
+    testing.assert_frame_equal(
+        first, frame.assign_splits(df, splits, seed=1, method="hash")
+    )
+    assert not first.equals(frame.assign_splits(df, splits, seed=2, method="hash"))
+    with pytest.raises(ValueError, match="stratify_by"):
+        frame.assign_splits(df, splits, stratify_by="id", method="hash")
+    with pytest.raises(ValueError, match="Unknown method"):
+        frame.assign_splits(df, splits, method="random")
+
+
 # ── Hypothesis strategies ─────────────────────────────────────────────────────
 
 
@@ -318,6 +692,15 @@ class TestDeterminism:
         native_result = df.sample(n=10, with_replacement=True, seed=3)
         assert_frame_equal(lazy_result, native_result, check_row_order=False)
 
+    @pytest.mark.parametrize("with_replacement", [False, True])
+    def test_unseeded_rows_stay_aligned(self, with_replacement: bool):
+        df = pl.DataFrame({"a": range(100), "b": range(100)})
+        result = lazy_sample(
+            df.lazy(), n=10, with_replacement=with_replacement, seed=None
+        ).collect()
+        assert result.columns == ["a", "b"]
+        assert (result["a"] == result["b"]).all()
+
 
 class TestWithoutReplacement:
     def test_no_duplicate_rows_without_replacement(self):
@@ -412,6 +795,199 @@ class TestErrors:
             lazy_sample(df.lazy(), n=10, with_replacement=False, seed=0).collect()
 
 
+class TestStreamingMethods:
+    def test_bernoulli_fraction(self):
+        df = pl.DataFrame({"a": range(10_000), "b": [str(i) for i in range(10_000)]})
+        result = lazy_sample(df.lazy(), fraction=0.3, seed=0, method="bernoulli")
+        collected = result.collect()
+        assert abs(len(collected) - 3_000) < 300
+        assert collected["a"].is_sorted()
+        assert (collected["a"].cast(pl.String) == collected["b"]).all()
+        assert collected.columns == df.columns
+        streamed = result.collect(engine="streaming")
+        assert_frame_equal(streamed, collected)
+
+    def test_reservoir_n(self):
+        df = pl.DataFrame({"a": range(1_000)})
+        result = lazy_sample(df.lazy(), n=50, seed=1, method="reservoir")
+        collected = result.collect()
+        assert len(collected) == 50
+        assert collected["a"].n_unique() == 50
+        assert collected["a"].is_sorted()
+        assert_frame_equal(result.collect(engine="streaming"), collected)
+        shuffled = lazy_sample(
+            df.lazy(), n=50, shuffle=True, seed=1, method="reservoir"
+        ).collect()
+        assert_frame_equal(shuffled, collected, check_row_order=False)
+        assert not shuffled["a"].is_sorted()
+
+    def test_reservoir_is_lazy(self):
+        lf = pl.LazyFrame({"a": ["1", "x"]}).with_columns(pl.col("a").cast(pl.Int64))
+        result = lazy_sample(lf, n=1, method="reservoir")
+        with pytest.raises(pl.exceptions.InvalidOperationError):
+            result.collect()
+
+    def test_reservoir_n_exceeds_rows(self):
+        df = pl.DataFrame({"a": range(5)})
+        result = lazy_sample(df.lazy(), n=10, method="reservoir").collect()
+        assert_frame_equal(result, df)
+
+
+@pytest.fixture
+def labeled_lf() -> pl.LazyFrame:
+    return pl.LazyFrame(
+        {
+            "id": [i // 4 for i in range(4_000)],
+            "label": [int(i < 400) for i in range(4_000)],
+            "value": range(4_000),
+        }
+    )
+
+
+class TestGroupedSampling:
+    def test_by_keeps_groups_whole(self, labeled_lf: pl.LazyFrame):
+        for method in ["exact", "bernoulli"]:
+            result = lazy_sample(
+                labeled_lf, fraction=0.25, by="id", seed=1, method=method
+            ).collect()
+            sizes = result.group_by("id").len()["len"]
+            assert (sizes == 4).all()
+            assert abs(sizes.len() - 250) <= (0 if method == "exact" else 50)
+        result = lazy_sample(labeled_lf, n=10, by="id", seed=1).collect()
+        assert result["id"].n_unique() == 10
+        assert len(result) == 40
+        assert result.columns == ["id", "label", "value"]
+        assert result["value"].is_sorted()
+
+    def test_stratify_by_n_and_fraction(self, labeled_lf: pl.LazyFrame):
+        result = lazy_sample(labeled_lf, n=30, stratify_by="label", seed=2).collect()
+        counts = result["label"].value_counts().sort("label")["count"].to_list()
+        assert counts == [30, 30]
+        result = lazy_sample(
+            labeled_lf, fraction={1: 1.0, 0: 0.1}, stratify_by="label", seed=2
+        ).collect()
+        counts = result["label"].value_counts().sort("label")["count"].to_list()
+        assert counts == [360, 400]
+
+    def test_by_and_stratify_by(self, labeled_lf: pl.LazyFrame):
+        result = lazy_sample(
+            labeled_lf, n={0: 5, 1: 2}, by="id", stratify_by="label", seed=3
+        ).collect()
+        groups = result.group_by("label").agg(pl.col("id").n_unique())
+        assert groups.sort("label")["id"].to_list() == [5, 2]
+        assert len(result) == 28
+
+    def test_bernoulli_stratified_streams(self, labeled_lf: pl.LazyFrame):
+        query = lazy_sample(
+            labeled_lf,
+            fraction={0: 0.1, 1: 1.0},
+            stratify_by="label",
+            seed=4,
+            method="bernoulli",
+        )
+        result = query.collect()
+        assert result.filter(pl.col("label") == 1).height == 400
+        assert_frame_equal(query.collect(engine="streaming"), result)
+
+
+@pytest.mark.parametrize(
+    "sample",
+    [
+        partial(lazy_sample, n=10, method="reservoir"),
+        partial(lazy_sample, fraction=0.1, method="bernoulli"),
+        partial(lazy_sample, fraction=0.1, by="id"),
+        partial(lazy_sample, n=10, stratify_by="label"),
+        partial(frame.bootstrap, n_replicates=2),
+        partial(frame.bootstrap, n_replicates=2, by="id", layout="long"),
+    ],
+)
+def test_sample_seeded(labeled_lf: pl.LazyFrame, sample: Callable[..., pl.LazyFrame]):
+    r1 = sample(labeled_lf, seed=5).collect()
+    r2 = sample(labeled_lf, seed=5).collect()
+    r3 = sample(labeled_lf, seed=6).collect()
+    assert_frame_equal(r1, r2)
+    assert not r1.equals(r3)
+    assert_frame_equal(sample(labeled_lf, seed=5).collect(engine="streaming"), r1)
+
+
+@pytest.mark.parametrize(
+    ("sample", "kwargs", "match"),
+    [
+        (
+            lazy_sample,
+            {"n": 2, "with_replacement": True, "method": "reservoir"},
+            "with_replacement",
+        ),
+        (
+            lazy_sample,
+            {"n": 2, "with_replacement": True, "by": "id"},
+            "with_replacement",
+        ),
+        (lazy_sample, {"n": 2, "method": "bernoulli"}, "requires a fraction"),
+        (lazy_sample, {"fraction": 0.5, "method": "reservoir"}, "requires n"),
+        (lazy_sample, {"n": 2, "method": "systematic"}, "Unknown method"),
+        (frame.bootstrap, {"n_replicates": 0}, "n_replicates"),
+        (frame.bootstrap, {"n_replicates": 2, "layout": "matrix"}, "Unknown layout"),
+    ],
+)
+def test_sample_errors(
+    labeled_lf: pl.LazyFrame, sample: Callable, kwargs: dict, match: str
+):
+    with pytest.raises(ValueError, match=match):
+        sample(labeled_lf, **kwargs)
+
+
+def test_sample_per_stratum_requires_single_column(labeled_lf: pl.LazyFrame):
+    with pytest.raises(TypeError, match="single stratify_by"):
+        lazy_sample(labeled_lf, fraction={0: 0.5}, method="bernoulli")
+
+
+class TestBootstrap:
+    @pytest.fixture
+    def clustered_lf(self) -> pl.LazyFrame:
+        return pl.LazyFrame(
+            {"id": [i // 4 for i in range(20_000)], "value": range(20_000)}
+        )
+
+    def test_poisson_weights(self, clustered_lf: pl.LazyFrame):
+        result = frame.bootstrap(clustered_lf, 8, seed=1).collect()
+        assert result.columns[:2] == ["id", "value"]
+        weights = result.select(pl.selectors.starts_with("weight_"))
+        assert weights.width == 8
+        assert set(weights.dtypes) == {pl.UInt8}
+        stacked = pl.concat(weights.get_columns()).cast(pl.Float64)
+        assert stacked.mean() == pytest.approx(1.0, abs=0.01)
+        assert stacked.var() == pytest.approx(1.0, abs=0.03)
+        assert (stacked == 0).mean() == pytest.approx(math.exp(-1), abs=0.01)
+        assert abs(weights.select(pl.corr("weight_0", "weight_1")).item()) < 0.03
+
+    @pytest.mark.parametrize("layout", ["wide", "long"])
+    @pytest.mark.parametrize("by", [None, "id"])
+    def test_streams(self, clustered_lf: pl.LazyFrame, layout, by):
+        result = frame.bootstrap(clustered_lf, 4, by=by, layout=layout)
+        assert streaming.streaming_fallbacks(result) == []
+
+    def test_layouts_match(self, clustered_lf: pl.LazyFrame):
+        wide = frame.bootstrap(clustered_lf, 3, seed=2).collect()
+        long = frame.bootstrap(clustered_lf, 3, seed=2, layout="long", drop_zero=False)
+        expected = wide.unpivot(
+            index=["id", "value"], variable_name="replicate", value_name="weight"
+        ).with_columns(pl.col("replicate").str.strip_prefix("weight_").cast(pl.UInt32))
+        assert_frame_equal(long.collect(), expected, check_row_order=False)
+        dropped = frame.bootstrap(clustered_lf.collect(), 3, seed=2, layout="long")
+        assert isinstance(dropped, pl.DataFrame)
+        assert_frame_equal(
+            dropped, expected.filter(pl.col("weight") > 0), check_row_order=False
+        )
+
+    def test_by_shares_weights(self, clustered_lf: pl.LazyFrame):
+        result = frame.bootstrap(clustered_lf, 4, by="id", seed=3).collect()
+        weights = pl.selectors.starts_with("weight_")
+        per_group = result.group_by("id").agg(weights.n_unique())
+        assert per_group.select(weights.max()).row(0) == (1, 1, 1, 1)
+        assert result["weight_0"].n_unique() > 3
+
+
 # ── Hypothesis property-based tests ──────────────────────────────────────────
 
 
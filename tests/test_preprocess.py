@@ -29,3 +29,135 @@ def test_filter_null_rows(preprocess_lf: pl.LazyFrame):
 def test_drop_low_variance(preprocess_lf: pl.LazyFrame):
     result = preprocess.drop_low_variance(frame=preprocess_lf, cutoff=0.5)
     testing.assert_frame_equal(result, preprocess_lf.select(["a"]))
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 10])
+@pytest.mark.parametrize("parallel", [None, 1, 2])
+@pytest.mark.parametrize("lazy", [True, False])
+def test_select_by_condition_batched(
+    preprocess_lf: pl.LazyFrame, batch_size: int, parallel: int | None, lazy: bool
+):
+    frame = preprocess_lf if lazy else preprocess_lf.collect()
+    for function, kwargs in [
+        (preprocess.drop_null_columns, {"cutoff": 0.5}),
+        (preprocess.drop_low_variance, {"cutoff": 0.5}),
+        (preprocess.drop_constant_columns, {}),
+    ]:
+        expected = function(frame=frame, **kwargs)
+        result = function(
+            frame=frame, batch_size=batch_size, parallel=parallel, **kwargs
+        )
+        assert isinstance(result, type(frame))
+        testing.assert_frame_equal(result, expected)
+
+
+def test_column_profile(preprocess_lf: pl.LazyFrame):
+    profile = preprocess.ColumnProfile.from_frame(preprocess_lf)
+    stats = profile.stats
+    assert stats["column"].to_list() == ["a", "b", "c"]
+    assert stats["null_fraction"].to_list() == [0.25, 0.75, 0.0]
+    assert stats["n_unique"].to_list() == [3, 1, 1]
+    assert stats["is_constant"].to_list() == [False, True, True]
+    expected = preprocess_lf.select(pl.all().var()).collect().row(0)
+    assert stats["variance"].to_list() == list(expected)
+
+
+def test_filters_with_profile(preprocess_lf: pl.LazyFrame):
+    profile = preprocess.ColumnProfile.from_frame(preprocess_lf)
+    for function, kwargs in [
+        (preprocess.drop_null_columns, {"cutoff": 0.5}),
+        (preprocess.drop_low_variance, {"cutoff": 0.5}),
+        (preprocess.drop_constant_columns, {}),
+    ]:
+        expected = function(frame=preprocess_lf, **kwargs)
+        result = function(frame=preprocess_lf, profile=profile, **kwargs)
+        testing.assert_frame_equal(result, expected)
+
+
+def test_column_profile_update():
+    df = pl.DataFrame(
+        {
+            "x": [1.0, None, 3.0, 4.0, 10.0, None],
+            "y": [1, 1, 1, 1, 2, 2],
+            "z": [None, None, None, 5, 5, 5],
+            "s": ["a", "b", "a", None, "c", "c"],
+        }
+    )
+    expected = preprocess.ColumnProfile.from_frame(df).stats
+    profile = preprocess.ColumnProfile.from_frame(df.head(3)).update(df.tail(3))
+    result = profile.stats
+    exact = ["column", "count", "null_count", "min", "max", "null_fraction"]
+    testing.assert_frame_equal(result.select(exact), expected.select(exact))
+    testing.assert_frame_equal(
+        result.select("mean", "m2", "variance"),
+        expected.select("mean", "m2", "variance"),
+    )
+    assert result["is_constant"].to_list() == [False, False, True, False]
+    assert result["n_unique"].to_list() == [2, 2, 1, 2]
+
+
+def test_drop_constant_columns_after_update():
+    df = pl.DataFrame(
+        {
+            "s": ["x", "y", "x", "z", "y"],
+            "t": ["x", "x", "x", "y", "y"],
+            "u": ["x"] * 5,
+            "c": [1] * 5,
+        }
+    )
+    profile = preprocess.ColumnProfile.from_frame(df.head(3)).update(df.tail(2))
+    # "t" and "u" are constant in each partition, so only their merge is unknown.
+    assert profile.stats["is_constant"].to_list() == [False, None, None, True]
+    result = preprocess.drop_constant_columns(frame=df, profile=profile)
+    testing.assert_frame_equal(result, df.select("s", "t", "u"))
+
+
+@pytest.fixture
+def correlated_df() -> pl.DataFrame:
+    x = pl.int_range(0, 200, eager=True).cast(pl.Float64)
+    noise = x.hash(0) / 2.0**64
+    return pl.DataFrame(
+        {
+            "id": [str(i) for i in range(200)],
+            "x": x,
+            "noise": noise,
+            "x_scaled": x * 3 + 1,
+            "x_negated": -x + noise * 0.01,
+            "noise_copy": noise.clone().scatter(0, None),
+            "constant": [1.0] * 200,
+        }
+    )
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 256])
+def test_correlated_pairs(correlated_df: pl.DataFrame, block_size: int):
+    columns = ["x", "noise", "x_scaled", "x_negated"]
+    pairs = preprocess.correlated_pairs(correlated_df, columns, 0.9, block_size)
+    assert {(left, right) for left, right, _ in pairs} == {
+        ("x", "x_scaled"),
+        ("x", "x_negated"),
+        ("x_scaled", "x_negated"),
+    }
+    correlation = correlated_df.select(pl.corr("x", "x_negated")).item()
+    assert dict(((left, right), r) for left, right, r in pairs)[
+        ("x", "x_negated")
+    ] == pytest.approx(correlation)
+
+
+def test_drop_correlated(correlated_df: pl.DataFrame):
+    result = preprocess.drop_correlated(correlated_df, cutoff=0.9, block_size=2)
+    assert result.columns == ["id", "x", "noise", "constant"]
+    lazy = preprocess.drop_correlated(correlated_df.lazy(), cutoff=0.9, sample=100)
+    assert lazy.collect_schema().names() == result.columns
+    only_x = preprocess.drop_correlated(
+        correlated_df, cutoff=0.9, columns=pl.selectors.starts_with("x")
+    )
+    assert only_x.columns == ["id", "x", "noise", "noise_copy", "constant"]
+
+
+def test_drop_correlated_without_numeric_columns():
+    data = pl.DataFrame({"s": ["a", "b"]})
+    assert preprocess.correlated_pairs(data, [], cutoff=0.9) == []
+    testing.assert_frame_equal(preprocess.drop_correlated(data), data)
+    lazy = preprocess.drop_correlated(data.lazy(), sample=1)
+    testing.assert_frame_equal(lazy.collect(), data)
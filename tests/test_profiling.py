@@ -0,0 +1,21 @@
+import time
+
+import polars as pl
+import pytest
+
+from nanook import profiling
+
+
+@pytest.mark.skipif(profiling.rss_mb() is None, reason="needs /proc")
+def test_sample_peak_rss():
+    def allocate() -> int:
+        # 200 MiB of touched pages, held while the sampler runs.
+        values = pl.int_range(25 * 2**20, eager=True, dtype=pl.Int64)
+        time.sleep(0.1)
+        return values.len()
+
+    before = profiling.rss_mb()
+    result, peak = profiling.sample_peak_rss(allocate)
+    assert result == 25 * 2**20
+    assert peak is not None and before is not None
+    assert peak - before > 150
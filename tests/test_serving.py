@@ -0,0 +1,65 @@
+import math
+
+import numpy as np
+import polars as pl
+import pytest
+from polars import testing
+
+from nanook import transform
+from nanook.serving import CompiledTransformer
+
+
+@pytest.fixture
+def steps() -> list[transform.Step]:
+    return [
+        transform.Step("impute", "mean", ["a", "b"]),
+        transform.Step("standardize", "zscore", ["a", "b"]),
+        transform.Step("standardize", "minmax", "a"),
+        transform.Step("impute", "median", "b"),
+        transform.Step("standardize", "robust", "a"),
+    ]
+
+
+@pytest.mark.parametrize("over", [None, "time"])
+def test_compiled_matches_transform(lf: pl.LazyFrame, steps, over):
+    data = lf.collect().with_columns(pl.col("b").cast(pl.Float64))
+    transformer = transform.Transformer(steps, over=over)
+    transformer.fit(data, train=pl.col("split").eq("a"))
+    compiled = CompiledTransformer.from_transformer(transformer)
+    # Consecutive affine steps are fused.
+    assert [kind for kind, _, _ in compiled.operations] == [
+        "fill",
+        "affine",
+        "fill",
+        "affine",
+    ]
+    expected = transformer.transform(data)
+    testing.assert_frame_equal(compiled.transform_frame(data), expected)
+    keys = data.select("time").rows() if over else None
+    result = compiled.transform_array(data.select("a", "b").to_numpy(), keys)
+    np.testing.assert_allclose(
+        result,
+        expected.select("a", "b").to_numpy().astype(float),
+        atol=1e-12,
+        equal_nan=True,
+    )
+
+
+def test_compiled_dict(lf: pl.LazyFrame, steps):
+    data = lf.collect().with_columns(pl.col("b").cast(pl.Float64))
+    transformer = transform.Transformer(steps, over="time").fit(data)
+    compiled = CompiledTransformer.from_transformer(transformer)
+    expected = transformer.transform(data).row(4, named=True)
+    result = compiled.transform_dict(data.row(4, named=True))
+    assert result["split"] == expected["split"]
+    assert result["a"] == pytest.approx(expected["a"])
+    assert result["b"] == pytest.approx(expected["b"])
+    batch = compiled.transform_dict({"time": [1, 99], "a": [None, 1.0], "b": [2, 3]})
+    assert batch["a"][0] == pytest.approx(expected["a"])
+    # Unseen groups have no statistics, so their values are missing.
+    assert math.isnan(batch["a"][1]) and math.isnan(batch["b"][1])
+
+
+def test_compile_requires_fit(steps):
+    with pytest.raises(ValueError, match="fitted"):
+        CompiledTransformer.from_transformer(transform.Transformer(steps))
@@ -0,0 +1,52 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from nanook.sketch import QuantileSketch, fit_sketches
+
+
+def rank_error(values: np.ndarray, estimate: float, q: float) -> float:
+    return abs(np.searchsorted(np.sort(values), estimate) / values.size - q)
+
+
+def test_sketch_exact_before_compaction():
+    values = np.random.default_rng(0).normal(size=50)
+    sketch = QuantileSketch(k=100).update(values)
+    for q in [0.0, 0.25, 0.5, 0.9, 1.0]:
+        assert sketch.quantile(q) == pytest.approx(np.quantile(values, q))
+
+
+def test_sketch_bounded_and_accurate():
+    values = np.random.default_rng(0).normal(size=200_000)
+    sketch = QuantileSketch(k=200)
+    for batch in np.array_split(values, 20):
+        sketch.update(batch)
+    assert sketch.count == values.size
+    assert sum(level.size for level in sketch.levels) < 1_000
+    for q in [0.1, 0.25, 0.5, 0.75, 0.9]:
+        estimate = sketch.quantile(q)
+        assert estimate is not None
+        assert rank_error(values, estimate, q) < 0.02
+
+
+def test_sketch_merge():
+    values = np.random.default_rng(1).exponential(size=100_000)
+    left = QuantileSketch(k=200).update(values[:30_000])
+    right = QuantileSketch(k=200).update(values[30_000:])
+    merged = left.merge(right)
+    assert merged.count == values.size
+    estimate = merged.quantile(0.5)
+    assert estimate is not None
+    assert rank_error(values, estimate, 0.5) < 0.02
+
+
+def test_sketch_empty():
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_fit_sketches_groups():
+    frame = pl.LazyFrame({"g": [1, 1, 2, 2, 2], "a": [1.0, None, 3.0, 4.0, 5.0]})
+    sketches = fit_sketches(frame, ["a"], over="g", chunk_size=2)
+    assert set(sketches) == {(1,), (2,)}
+    assert sketches[(1,)]["a"].count == 1
+    assert sketches[(2,)]["a"].quantile(0.5) == 4.0
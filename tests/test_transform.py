@@ -1,8 +1,9 @@
 import polars as pl
 import polars.selectors as cs
+import pytest
 from polars import testing
 
-from nanook import transform
+from nanook import streaming, transform
 
 
 def test_minmax_scale():
@@ -19,14 +20,427 @@ def test_zscore_scale():
     testing.assert_frame_equal(result, expected)
 
 
+def test_robust_scale():
+    data = pl.LazyFrame({"a": [0.0, 1.0, 2.0, 3.0, 100.0]})
+    expected = pl.LazyFrame({"a": [-1.0, -0.5, 0.0, 0.5, 49.0]})
+    result = data.with_columns(transform.robust_scale(cs.numeric()))
+    testing.assert_frame_equal(result, expected)
+
+
 # @pytest.mark.parametrize("method", ["minmax", "zscore"])
 def test_standardize():
     pass  # TODO: Implement test
 
 
-# @pytest.mark.parametrize("method", ["mean", "median", "interpolate", "forword_fill"])
-def test_impute():
-    pass  # TODO: Implement test
+@pytest.mark.parametrize(
+    "method, expected",
+    [
+        ("mean", [1.0, 2.0, 2.0, 2.0, 3.0]),
+        ("median", [1.0, 2.0, 2.0, 2.0, 3.0]),
+        ("interpolate", [1.0, 1.5, 2.0, 2.5, 3.0]),
+        ("forward_fill", [1.0, 1.0, 2.0, 2.0, 3.0]),
+        ("forword_fill", [1.0, 1.0, 2.0, 2.0, 3.0]),
+    ],
+)
+def test_impute(method, expected):
+    data = pl.DataFrame({"a": [1.0, None, 2.0, None, 3.0]})
+    result = data.select(transform.impute(pl.col("a"), method=method))
+    assert result["a"].to_list() == expected
+
+
+def test_pipeline_order_by():
+    data = pl.DataFrame(
+        {
+            "id": [2, 1, 1, 2, 1, 2],
+            "t": [3, 3, 1, 1, 2, 2],
+            "a": [None, 3.0, 1.0, 4.0, None, None],
+        }
+    )
+    transforms = [
+        transform.impute(pl.col("a"), method="forward_fill").alias("ffill"),
+        transform.impute(pl.col("a"), method="interpolate").alias("interp"),
+    ]
+    result = transform.pipeline(data, transforms, over="id", order_by="t")
+    assert result["ffill"].to_list() == [4.0, 3.0, 1.0, 4.0, 1.0, 4.0]
+    assert result["interp"].to_list() == [None, 3.0, 1.0, 4.0, 2.0, None]
+    testing.assert_frame_equal(
+        transform.pipeline(data, transforms, over=pl.col("id"), order_by="t"), result
+    )
+    # Sorted input takes the fast path and gives the same rows in sorted order.
+    ordered = data.sort("id", "t")
+    expected = result.sort("id", "t")
+    testing.assert_frame_equal(
+        transform.pipeline(ordered, transforms, over="id", order_by="t"), expected
+    )
+    testing.assert_frame_equal(
+        transform.pipeline(
+            ordered.lazy(), transforms, over="id", order_by="t", presorted=True
+        ).collect(),
+        expected,
+    )
+
+
+def test_transformer_matches_pipeline(lf: pl.LazyFrame):
+    columns = pl.col("a", "b", "c")
+    train = columns.filter(pl.col("split").eq("a"))
+    imputation = transform.impute(columns, method="median", train=train)
+    scale = transform.standardize(columns, method="zscore", train=train)
+    expected = transform.pipeline(lf, [imputation, scale], over="time")
+    steps = [
+        transform.Step("impute", "median", ["a", "b", "c"]),
+        transform.Step("standardize", "zscore", ["a", "b", "c"]),
+    ]
+    transformer = transform.Transformer(steps, over="time")
+    transformer.fit(lf, train=pl.col("split").eq("a"))
+    assert transformer.statistics is not None
+    assert transformer.statistics.height == 3
+    result = transformer.transform(lf)
+    testing.assert_frame_equal(result, expected, check_dtypes=False)
+
+
+def test_transformer_without_over(lf: pl.LazyFrame):
+    expected = lf.with_columns(
+        transform.minmax_scale(pl.col("a"), train=pl.col("a")),
+        transform.impute(pl.col("b"), method="mean"),
+    )
+    steps = [
+        transform.Step("standardize", "minmax", "a"),
+        transform.Step("impute", "mean", "b"),
+    ]
+    transformer = transform.Transformer(steps).fit(lf)
+    assert transformer.statistics is not None
+    assert transformer.statistics.columns == [
+        "__0_a_min",
+        "__0_a_max",
+        "__1_b_mean",
+    ]
+    testing.assert_frame_equal(transformer.transform(lf), expected)
+
+
+def test_transformer_unseen_group(lf: pl.LazyFrame):
+    steps = [transform.Step("impute", "mean", "a")]
+    transformer = transform.Transformer(steps, over="id").fit(lf)
+    batch = pl.DataFrame(
+        {"id": [1, 99], "a": [None, None]}, schema_overrides={"a": pl.Float64}
+    )
+    result = transformer.transform(batch)
+    assert result.columns == ["id", "a"]
+    assert result["a"].to_list() == [1.0, None]
+
+
+@pytest.mark.parametrize("over", [None, "time"])
+def test_transformer_sketch_matches_exact(lf: pl.LazyFrame, over):
+    # Sketches are exact until they compact, so small groups match exactly.
+    steps = [
+        transform.Step("impute", "mean", ["a", "b"]),
+        transform.Step("standardize", "robust", ["a", "b"]),
+        transform.Step("impute", "median", "c"),
+        transform.Step("standardize", "zscore", "c"),
+    ]
+    train = pl.col("split").eq("a")
+    exact = transform.Transformer(steps, over=over).fit(lf, train=train)
+    sketched = transform.Transformer(steps, over=over, sketch_size=50)
+    sketched.fit(lf, train=train)
+    assert sketched.statistics is not None and exact.statistics is not None
+    assert sorted(sketched.statistics.columns) == sorted(exact.statistics.columns)
+    testing.assert_frame_equal(
+        sketched.transform(lf), exact.transform(lf), check_dtypes=False
+    )
+
+
+def test_transformer_sketch_approximates_quantiles():
+    values = pl.int_range(0, 100_000, eager=True).shuffle(seed=0).cast(pl.Float64)
+    frame = pl.LazyFrame({"g": values % 2, "a": values})
+    steps = [transform.Step("standardize", "robust", "a")]
+    transformer = transform.Transformer(steps, over="g", sketch_size=200)
+    statistics = transformer.fit(frame).statistics
+    assert statistics is not None
+    exact = frame.group_by("g").agg(
+        pl.col("a").median().alias("__0_a_median"),
+        pl.col("a").quantile(0.25, interpolation="linear").alias("__0_a_q25"),
+        pl.col("a").quantile(0.75, interpolation="linear").alias("__0_a_q75"),
+    )
+    result = statistics.sort("g").to_numpy()
+    expected = exact.sort("g").collect().select(statistics.columns).to_numpy()
+    # Rank error of ~2% of 100_000 values.
+    assert abs(result - expected).max() < 2_000
+
+
+@pytest.mark.parametrize("over", [None, "time"])
+def test_transformer_fit_running_matches_fit(lf: pl.LazyFrame, over):
+    steps = [
+        transform.Step("impute", "mean", ["a", "b", "c"]),
+        transform.Step("standardize", "zscore", ["a", "b"]),
+        transform.Step("standardize", "minmax", ["a", "c"]),
+    ]
+    data = lf.collect()
+    history, delta = data.head(6), data.tail(4)
+    running = transform.RunningStatistics.from_frame(history, ["a", "b", "c"], over)
+    running = running.update(delta)
+    assert running.stats.height == data.select(over or pl.lit(0)).n_unique() * 3
+    expected = transform.Transformer(steps, over=over).fit(data)
+    result = transform.Transformer(steps, over=over).fit_running(running)
+    assert result.statistics is not None and expected.statistics is not None
+    testing.assert_frame_equal(
+        result.statistics.sort(over or pl.lit(0)),
+        expected.statistics.sort(over or pl.lit(0)),
+        check_dtypes=False,
+        check_column_order=False,
+    )
+
+
+def test_running_statistics_merge_matches_full(lf: pl.LazyFrame):
+    data = lf.collect()
+    full = transform.RunningStatistics.from_frame(data, ["a", "b"], over="id")
+    parts = [
+        transform.RunningStatistics.from_frame(part, ["a", "b"], over="id")
+        for part in data.partition_by("split")
+    ]
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+    testing.assert_frame_equal(
+        merged.stats.sort("id", "column"), full.stats.sort("id", "column")
+    )
+
+
+def test_running_statistics_unsupported(lf: pl.LazyFrame):
+    running = transform.RunningStatistics.from_frame(lf, ["a"])
+    transformer = transform.Transformer([transform.Step("impute", "median", "a")])
+    with pytest.raises(ValueError, match="cannot be derived"):
+        transformer.fit_running(running)
+    with pytest.raises(ValueError, match="same `over`"):
+        transform.Transformer(transformer.steps, over="id").fit_running(running)
+
+
+METHODS = [
+    ("impute", "mean"),
+    ("impute", "median"),
+    ("standardize", "minmax"),
+    ("standardize", "zscore"),
+    ("standardize", "robust"),
+]
+
+
+@pytest.mark.parametrize("first", METHODS)
+@pytest.mark.parametrize("second", METHODS)
+@pytest.mark.parametrize("over", [None, "time"])
+def test_fit_statistics_matches_sequential(lf: pl.LazyFrame, first, second, over):
+    steps = [transform.Step(*first, ["a", "b"]), transform.Step(*second, ["a", "c"])]
+    result = transform.fit_statistics(lf, steps, over=over).collect()
+    # Each step fitted on the actual output of the one before it.
+    first_statistics = transform.fit_statistics(lf, steps[:1], over=over)
+    applied = transform.apply_steps(lf, steps[:1], first_statistics, over=over)
+    second_statistics = transform.fit_statistics(applied, steps[1:], over, start=1)
+    if over is None:
+        expected = pl.concat(
+            [first_statistics.collect(), second_statistics.collect()],
+            how="horizontal",
+        )
+    else:
+        expected = first_statistics.join(second_statistics, on=over).collect()
+    testing.assert_frame_equal(
+        result.sort(over or pl.lit(0)),
+        expected.sort(over or pl.lit(0)),
+        check_dtypes=False,
+        check_column_order=False,
+    )
+
+
+def test_plan_statistics_shares_aggregations():
+    columns = ["a", "b"]
+    steps = [
+        transform.Step("impute", "mean", columns),
+        transform.Step("standardize", "zscore", columns),
+        transform.Step("standardize", "minmax", columns),
+    ]
+    aggregated, statistics = transform.plan_statistics(steps)
+    # The row count, and the count, mean, std, min and max of each column; every
+    # later statistic is derived from these.
+    assert len(aggregated) == 1 + 5 * len(columns)
+    assert len(statistics) == 5 * len(columns)
+
+
+def test_step_unknown_method():
+    with pytest.raises(ValueError, match="Unknown method"):
+        transform.Step("standardize", "median", "a")
+    with pytest.raises(ValueError, match="Unknown kind"):
+        transform.Step("scale", "zscore", "a")
+
+
+def test_transform_before_fit(lf: pl.LazyFrame):
+    transformer = transform.Transformer([transform.Step("impute", "mean", "a")])
+    with pytest.raises(ValueError, match="fitted"):
+        transformer.transform(lf)
+
+
+def sequential_pipeline(frame, transforms, over):
+    for expr in transforms:
+        frame = frame.with_columns(expr.over(over))
+    return frame
+
+
+def test_plan_stages(lf: pl.LazyFrame):
+    transforms = [
+        transform.impute(pl.col("a"), method="mean"),
+        transform.impute(pl.col("b"), method="median"),
+        transform.standardize(pl.col("a"), method="zscore"),
+        transform.standardize(pl.col("c"), method="minmax"),
+        transform.standardize(cs.numeric(), method="minmax"),
+    ]
+    stages = transform.plan_stages(lf, transforms)
+    assert [len(stage) for stage in stages] == [2, 2, 1]
+
+
+def test_plan_stages_steps(lf: pl.LazyFrame):
+    transforms = [
+        transform.Step("impute", "mean", "a"),
+        transform.Step("standardize", "zscore", "a"),
+        transform.impute(pl.col("b"), method="mean"),
+        transform.Step("impute", "mean", "c"),
+    ]
+    stages = transform.plan_stages(lf, transforms)
+    assert [len(stage) for stage in stages] == [2, 1, 1]
+
+
+def test_pipeline_matches_sequential(lf: pl.LazyFrame):
+    columns = pl.col("a", "b", "c")
+    train = columns.filter(pl.col("split").eq("a"))
+    transforms = [
+        transform.impute(columns, method="median", train=train),
+        transform.impute(pl.col("id").cast(pl.Float64), method="mean"),
+        transform.standardize(columns, method="zscore", train=train),
+        transform.standardize(pl.col("id"), method="minmax"),
+    ]
+    result = transform.pipeline(lf, transforms, over="time")
+    expected = sequential_pipeline(lf, transforms, over="time")
+    testing.assert_frame_equal(result, expected)
+
+
+def test_pipeline_without_over(lf: pl.LazyFrame):
+    transforms = [transform.impute(pl.col("a", "b"), method="mean")]
+    result = transform.pipeline(lf, transforms)
+    expected = lf.with_columns(transforms)
+    testing.assert_frame_equal(result, expected)
+
+
+def test_pipeline_steps(lf: pl.LazyFrame):
+    columns = pl.col("a", "b", "c")
+    train = columns.filter(pl.col("split").eq("a"))
+    transforms = [
+        transform.impute(columns, method="median", train=train),
+        transform.standardize(columns, method="zscore", train=train),
+    ]
+    expected = transform.pipeline(lf, transforms, over="time")
+    steps = [
+        transform.Step("impute", "median", ["a", "b", "c"]),
+        transform.Step("standardize", "zscore", ["a", "b", "c"]),
+    ]
+    is_train = pl.col("split").eq("a")
+    result = transform.pipeline(lf, list(steps), over="time", train=is_train)
+    assert isinstance(result, pl.LazyFrame)
+    testing.assert_frame_equal(result, expected, check_dtypes=False)
+    result = transform.pipeline(lf.collect(), list(steps), train=is_train)
+    transformer = transform.Transformer(steps).fit(lf, train=is_train)
+    testing.assert_frame_equal(result, transformer.transform(lf).collect())
+
+
+@pytest.mark.parametrize("over", [None, "time", ["time", "split"]])
+def test_pipeline_out_of_core(lf: pl.LazyFrame, over):
+    columns = pl.col("a", "b", "c")
+    train = columns.filter(pl.col("split").eq("a"))
+    transforms = [
+        transform.impute(columns, method="median", train=train),
+        transform.impute(pl.col("id").cast(pl.Float64), method="mean"),
+        transform.standardize(columns, method="zscore", train=train),
+        transform.standardize(cs.by_name("id"), method="minmax"),
+        transform.impute(pl.col("a"), method="forward_fill"),
+        (pl.col("b") - pl.col("b").mean()).alias("b_centered"),
+    ]
+    expected = transform.pipeline(lf, transforms, over=over).collect()
+    with pytest.warns(UserWarning, match="stays a window") as record:
+        result = transform.pipeline(lf, transforms, over=over, out_of_core=True)
+    assert len(record) == 1
+    assert record[0].filename == __file__
+    testing.assert_frame_equal(result.collect(), expected)
+    with pytest.warns(UserWarning, match="stays a window"):
+        result = transform.pipeline(
+            lf.collect(), transforms, over=over, out_of_core=True
+        )
+    testing.assert_frame_equal(result, expected)
+
+
+def test_join_aggregations_unrecognized_node():
+    node = {"Agg": {"Mean": {"Column": "a"}}, "Unknown": None}
+    with pytest.raises(ValueError, match="Unrecognized serialized expression"):
+        streaming.map_elementwise(node, streaming.streamable_aggregation)
+    node = {"BinaryExpr": {"lhs": {"Column": "a"}, "rhs": {"Column": "b"}}}
+    with pytest.raises(ValueError, match="Unrecognized serialized expression"):
+        streaming.map_elementwise(node, streaming.streamable_aggregation)
+
+
+def test_join_aggregations_warns_at_caller(lf: pl.LazyFrame):
+    with pytest.warns(UserWarning, match="stays a window") as record:
+        streaming.join_aggregations(lf, [pl.col("a").forward_fill()], over="time")
+    assert record[0].filename == __file__
+
+
+def test_streaming_formats_recognized():
+    # Fails when Polars changes the serialized expressions or plan graphs that
+    # `join_aggregations` and `streaming_fallbacks` parse.
+    streaming.check_serialization()
+    data = pl.LazyFrame({"a": [1.0, 2.0]})
+    assert streaming.streaming_fallbacks(data.select(pl.col("a").median())) == [
+        'in-memory-map\nSELECT [\n_POLARS_TMP = col("a").median()\n]'
+    ]
+    assert streaming.streaming_fallbacks(data.select(pl.col("a") + 1)) == []
+
+
+def test_streaming_fallbacks_unrecognized_graph(monkeypatch):
+    graph = 'digraph polars {\n1 [label="select"];\n}'
+    monkeypatch.setattr(pl.LazyFrame, "show_graph", lambda *args, **kwargs: graph)
+    with pytest.raises(RuntimeError, match="plan graph .* is not recognized"):
+        streaming.streaming_fallbacks(pl.LazyFrame({"a": [1]}))
+
+
+def test_check_streaming(lf: pl.LazyFrame):
+    transforms = [
+        transform.impute(pl.col("a", "b"), method="mean"),
+        transform.impute(pl.col("c"), method="forward_fill"),
+        transform.standardize(pl.col("a"), method="zscore"),
+        transform.Step("impute", "median", "b"),
+    ]
+    # Polars 2.0 runs these windows in the streaming engine.
+    windows = streaming.streaming_fallbacks(lf.select(pl.col("a").mean().over("time")))
+    windowed = [0, 0, 1] if windows else []
+    report = transform.check_streaming(lf, transforms, over="time")
+    assert report["stage"].to_list() == [*windowed, 2]
+    assert report["transform"].to_list() == [
+        *map(str, transforms[: len(windowed)]),
+        str(transforms[3]),
+    ]
+    assert report["node"].str.starts_with("in-memory-map").all()
+    filled = [str(transforms[1])] if windows else []
+    report = transform.check_streaming(lf, transforms, over="time", out_of_core=True)
+    assert report["transform"].to_list() == [*filled, str(transforms[3])]
+    assert "median" in report["node"][-1]
+    report = transform.check_streaming(
+        lf, transforms, over="time", out_of_core=True, sketch_size=64
+    )
+    assert report["transform"].to_list() == filled
+
+
+# Every transform is rewritten into joined aggregations, so none warns.
+@pytest.mark.filterwarnings("error")
+def test_pipeline_out_of_core_sketch(lf: pl.LazyFrame):
+    transforms = [
+        transform.impute(pl.col("a", "b"), method="median"),
+        transform.standardize(pl.col("c"), method="robust"),
+    ]
+    expected = transform.pipeline(lf, transforms, over="time").collect()
+    result = transform.pipeline(
+        lf, transforms, over="time", out_of_core=True, sketch_size=64
+    )
+    # Sketches below their capacity hold every value.
+    testing.assert_frame_equal(result.collect(), expected, check_dtypes=False)
 
 
 # def test_integration(lf: pl.LazyFrame):
@@ -39,3 +453,28 @@ def test_impute():
 #     transforms = [imputation, scale]
 #     lf = transform.pipeline(lf, transforms, over="time")
 #     pass
+
+
+def test_profile_pipeline(lf: pl.LazyFrame):
+    transforms = [
+        transform.impute(pl.col("a", "b"), method="mean"),
+        transform.standardize(pl.col("a"), method="zscore"),
+        transform.Step("standardize", "minmax", ["b", "c"]),
+    ]
+    records = []
+    result, profile = transform.profile_pipeline(
+        lf, transforms, over="time", callback=records.append
+    )
+    expected = transform.pipeline(lf, transforms, over="time").collect()
+    testing.assert_frame_equal(result, expected)
+    assert profile["kind"].to_list() == ["expressions", "expressions", "steps"]
+    assert profile["rows_in"].to_list() == [None, 10, 10]
+    assert profile["rows_out"].to_list() == [10, 10, 10]
+    assert profile["seconds"].min() >= 0
+    assert "JOIN" in profile["plan"][2]
+    if hasattr(pl.LazyFrame, "profile"):
+        assert profile["nodes"].list.len().min() > 0
+    else:
+        assert profile["nodes"].is_null().all()
+    assert [record["stage"] for record in records] == [0, 1, 2]
+    assert profile["peak_rss_mb"].min() > 0